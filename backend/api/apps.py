@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        if getattr(settings, 'METRICS_ENABLED', True):
+            # Before any database connection opens, so every one is instrumented
+            from chatbot.gemini_interface import client
+            from .metrics import observe_llm_call
+
+            if observe_llm_call not in client.observers:
+                client.observers.append(observe_llm_call)
@@ -0,0 +1,139 @@
+"""
+Async views, served efficiently when the project runs under ``backend/asgi.py``.
+
+DRF's ``@api_view`` has no async support, so these are plain Django async views
+that authenticate with ``CachedTokenAuthentication`` themselves. All ORM work
+goes through ``sync_to_async``; only the model stream runs on the event loop.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import guess_cache
+from .authentication import CachedTokenAuthentication
+from .game import (
+    TIMEOUT_SENTINEL,
+    build_prompt,
+    guess_cache_key,
+    open_conversation,
+    record_guess,
+    record_timeout,
+    state_delta,
+)
+from .models import Message
+from chatbot.gemini_interface import CallMetrics, get_gemini_response_stream_async
+
+
+logger = logging.getLogger(__name__)
+
+def _authenticate(request):
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _start_guess(user, data, topic_name):
+    user_prompt = data.get('prompt', '')
+    conversation = open_conversation(user, data.get('conversation_id'), user_prompt, topic_name)
+    prompt = build_prompt(conversation, user_prompt)
+    cache_key = guess_cache_key(conversation, topic_name, user_prompt)
+    cached_reply = guess_cache.lookup(cache_key)
+    user_message = Message.objects.create(
+        conversation=conversation,
+        sender='user',
+        content=user_prompt
+    )
+    return conversation, user_message, prompt, cache_key, cached_reply
+
+
+def _timeout(user, data, topic_name):
+    conversation = open_conversation(user, data.get('conversation_id'), data.get('prompt', ''), topic_name)
+    outcome = record_timeout(conversation, user, topic_name)
+    return conversation, state_delta(conversation, outcome)
+
+
+@csrf_exempt
+@require_POST
+async def chat_stream_async(request, topic_name):
+    """Async variant of ``views.chat_stream`` with the same SSE event format"""
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if not isinstance(data, dict) or not isinstance(data.get('prompt', ''), str):
+        return JsonResponse({"error": "Body must be a JSON object with a string prompt"}, status=400)
+
+    if TIMEOUT_SENTINEL in data.get('prompt', ''):
+        # Legacy timeout signal: advance the round without calling the model
+        try:
+            conversation, state = await sync_to_async(_timeout)(user, data, topic_name)
+        except Exception as e:
+            logger.exception("Error ending round: %s", e)
+            return JsonResponse({"error": f"Error ending round: {str(e)}"}, status=500)
+        event = json.dumps({"chunk": "", "done": True, "conversation_id": str(conversation.id), "state": state})
+        return StreamingHttpResponse(iter([f"data: {event}\n\n"]), content_type='text/event-stream')
+
+    try:
+        conversation, user_message, prompt, cache_key, cached_reply = await sync_to_async(_start_guess)(
+            user, data, topic_name
+        )
+    except Exception as e:
+        logger.exception("Error starting guess: %s", e)
+        return JsonResponse({"error": f"Could not save message: {str(e)}"}, status=500)
+
+    user_prompt = user_message.content
+    start_time = time.time()
+    metrics = CallMetrics()
+
+    async def replay(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    async def event_stream():
+        text = ""
+        chunks = []
+        if cached_reply is not None:
+            stream = replay(cached_reply)
+        else:
+            stream = get_gemini_response_stream_async(prompt.text, metrics=metrics)
+        async for chunk in stream:
+            text += chunk
+            chunks.append(chunk)
+            data = json.dumps({
+                "chunk": chunk,
+                "done": False,
+                "conversation_id": None
+            })
+            yield f"data: {data}\n\n"
+        if cached_reply is None:
+            await sync_to_async(guess_cache.store)(cache_key, chunks)
+        state = None
+        try:
+            bot_message, outcome = await sync_to_async(record_guess)(
+                conversation, user, topic_name, user_prompt, text, start_time,
+                prompt_tokens=prompt.tokens, metrics=metrics, cache_hit=cached_reply is not None
+            )
+            state = state_delta(conversation, outcome, user_message, bot_message)
+        except Exception as e:
+            logger.exception("Error saving bot message: %s", e)
+        data = json.dumps({
+            "chunk": "",
+            "done": True,
+            "conversation_id": str(conversation.id),
+            "state": state
+        })
+        yield f"data: {data}\n\n"
+
+    return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
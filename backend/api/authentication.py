@@ -0,0 +1,121 @@
+"""
+Token authentication without a database query per request.
+
+``CachedTokenAuthentication`` resolves a token to its user and the user's
+``UserProfile`` in one query, then keeps the result in a per-process LRU of
+``AUTH_TOKEN_CACHE_SIZE`` entries for ``AUTH_TOKEN_CACHE_TTL`` seconds. Every
+request gets its own copies of the cached objects, so nothing a view sets on
+``request.user`` leaks into other requests.
+
+Deleting a token (``logout_view``, the admin, a deleted user) or saving a user
+drops their entries in this process at once; other processes notice within
+the TTL, which is why it is kept short. The cached profile is only as fresh
+as the TTL too: read the counters from the database where they are shown.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .metrics import note_cache_hit
+from .models import UserProfile
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TokenCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached ``(user, profile, token)`` for ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires = time.monotonic() + _setting('AUTH_TOKEN_CACHE_TTL', 60)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > _setting('AUTH_TOKEN_CACHE_SIZE', 1024):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (_, value) in self._entries.items() if value[0].pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` backed by ``token_cache``; same header, same errors."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user__userprofile').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            user = token.user
+            try:
+                profile = user.userprofile
+            except UserProfile.DoesNotExist:
+                profile = None
+            cached = (user, profile, token)
+            token_cache.set(key, cached)
+        else:
+            note_cache_hit('auth_token')
+
+        user, profile, token = cached
+        user = copy.copy(user)
+        if profile is not None:
+            user.userprofile = copy.copy(profile)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
+
+
+@receiver(post_delete, sender=Token)
+def _token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, instance, **kwargs):
+    # Deactivation, renames, password changes: resolve the tokens again
+    token_cache.invalidate_user(instance.pk)
@@ -0,0 +1,79 @@
+"""
+Background generation of the end-of-round word descriptions.
+
+A round ends as soon as its bookkeeping is saved; the description of the word
+that was just played is produced here, off the request thread, and written to
+``Conversation.word_description`` when the model answers. Clients read it from
+``conversations/<id>/description/`` (or ``conversations/<id>/``) while
+``description_status`` is ``pending``.
+
+A description still queued or running when its process exits is lost. Polls
+of a description that has been ``pending`` for more than
+``WORD_DESCRIPTION_STALE_SECONDS`` queue it again (``retry_if_stale``).
+
+Set ``WORD_DESCRIPTION_ASYNC=False`` to generate inline instead (handy for
+tests and one-off scripts).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Conversation
+from chatbot.gemini_interface import get_word_description
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'WORD_DESCRIPTION_WORKERS', 4),
+    thread_name_prefix='word-description',
+)
+
+
+def _generate(conversation_id, word, topic):
+    try:
+        description = get_word_description(word, topic)
+        # Only fill it in if no later round has replaced the word meanwhile
+        Conversation.objects.filter(id=conversation_id, described_word=word).update(
+            word_description=description,
+            description_status='ready',
+        )
+    except Exception as e:
+        logger.exception("Error generating description for '%s': %s", word, e)
+    finally:
+        close_old_connections()
+
+
+def schedule_description(conversation_id, word, topic):
+    """Queue the description of ``word`` for ``conversation_id``."""
+    if not getattr(settings, 'WORD_DESCRIPTION_ASYNC', True):
+        _generate(conversation_id, word, topic)
+        return None
+    return _executor.submit(_generate, conversation_id, word, topic)
+
+
+def retry_if_stale(conversation_id, word, topic, requested_at):
+    """Queue the description of ``word`` again if it was queued too long ago.
+
+    ``requested_at`` is the ``description_requested_at`` the caller read. Of
+    several concurrent callers only the one that moves it on queues the
+    description. Returns whether it was queued again.
+    """
+    stale_after = timedelta(seconds=getattr(settings, 'WORD_DESCRIPTION_STALE_SECONDS', 30))
+    now = timezone.now()
+    if requested_at is not None and now - requested_at < stale_after:
+        return False
+    claimed = Conversation.objects.filter(
+        id=conversation_id,
+        described_word=word,
+        description_status='pending',
+        description_requested_at=requested_at,
+    ).update(description_requested_at=now)
+    if not claimed:
+        return False
+    logger.info("Description of '%s' for conversation %s was lost, queueing it again", word, conversation_id)
+    schedule_description(conversation_id, word, topic)
+    return True
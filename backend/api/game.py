@@ -0,0 +1,254 @@
+"""
+Game bookkeeping shared by the synchronous and asynchronous chat views.
+
+Everything in here is plain blocking Django ORM code; the async view calls it
+through ``sync_to_async`` so the event loop never waits on the database.
+"""
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from . import guess_cache
+from .models import Conversation, Message, UserProfile
+from .prompt_logs import prompt_log_writer
+from .prompts import estimate_tokens, prompt_context
+from .word_pool import word_pool
+from .matching import matcher_for
+from .descriptions import schedule_description
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SENTINEL = "__TIMEOUT__"
+DEFAULT_TOPIC = "ancient_history"
+GUESSES_PER_ROUND = 3
+GAME_STATE_FIELDS = (
+    'score', 'num_rounds', 'current_word', 'guesses_remaining',
+    'word_description', 'described_word', 'description_status',
+)
+STATE_VERSION = 1
+
+
+def get_word(topic):
+    word, topic = word_pool.pick(topic)
+    logger.debug("Selected word: %s from topic: %s", word, topic)
+    matcher_for(word)  # precompute the matcher while the round is set up
+    return word
+
+
+def open_conversation(user, conversation_id, prompt, topic_name):
+    """Return the user's conversation ``conversation_id`` or start a new one."""
+    if conversation_id and conversation_id != "null" and str(conversation_id).strip():
+        try:
+            conversation = get_object_or_404(Conversation, id=conversation_id, user=user)
+            logger.debug("Retrieved existing conversation: %s", conversation.id)
+            return conversation
+        except Exception as e:
+            logger.warning("Error retrieving conversation %s: %s", conversation_id, e)
+
+    title_preview = ' '.join((prompt or '').split()[:5])
+    if len(title_preview) > 0:
+        title = f"Chat about {title_preview}..."
+    else:
+        title = "TOPIC: ANCIENT HISTORY"
+
+    if not topic_name:
+        topic_name = DEFAULT_TOPIC
+    logger.debug("Using topic: %s", topic_name)
+
+    conversation = Conversation.objects.create(
+        user=user,
+        title=title,
+        current_word=get_word(topic_name),
+        guesses_remaining=GUESSES_PER_ROUND,
+    )
+    logger.debug("Created conversation %s for user %s", conversation.id, user.username)
+    prompt_context.start(conversation)
+    return conversation
+
+
+def build_prompt(conversation, user_prompt):
+    """Recent history of ``conversation`` followed by the new prompt, see ``prompts``.
+
+    Must be called before the user's message is saved.
+    """
+    return prompt_context.build(conversation, user_prompt)
+
+
+def guess_cache_key(conversation, topic_name, user_prompt):
+    """Key of ``user_prompt`` in the guess cache, or ``None`` if the topic is not cached.
+
+    Must be called before the user's message is saved, like ``build_prompt``.
+    The key covers the exchanges of the current round, which are the last
+    ``GUESSES_PER_ROUND - guesses_remaining`` of the context.
+    """
+    if conversation.guesses_remaining > GUESSES_PER_ROUND:
+        # First round of a conversation created with the old 4-guess default:
+        # where the round started is unknown, so do not cache it
+        return None
+    played = GUESSES_PER_ROUND - conversation.guesses_remaining
+    entries = prompt_context.entries(conversation)[-2 * played:] if played > 0 else []
+    return guess_cache.make_key(
+        topic_name or DEFAULT_TOPIC,
+        conversation.current_word,
+        [(sender, content) for sender, content, _ in entries],
+        user_prompt,
+    )
+
+
+def _end_round(conversation, user, topic_name, won):
+    """Move ``conversation`` to its next word and return the word that was played.
+
+    Must run inside the transaction holding the conversation's row lock. The
+    description of the played word is generated in the background once that
+    transaction commits (see ``descriptions.schedule_description``).
+    """
+    old_word = conversation.current_word
+    new_word = get_word(topic_name)
+    now = timezone.now()
+    Conversation.objects.filter(id=conversation.id).update(
+        score=F('score') + int(won),
+        num_rounds=Greatest(F('num_rounds') - 1, 0),
+        current_word=new_word,
+        guesses_remaining=GUESSES_PER_ROUND,
+        word_description="",
+        described_word=old_word,
+        description_status='pending',
+        description_requested_at=now,
+        description_topic=topic_name or '',
+        updated_at=now,
+    )
+    UserProfile.objects.filter(user_id=user.id).update(
+        rounds_played=F('rounds_played') + 1,
+        rounds_won=F('rounds_won') + int(won),
+    )
+
+    # Mirror the update on the in-memory instance (values read under the lock)
+    conversation.score += int(won)
+    conversation.num_rounds = max(conversation.num_rounds - 1, 0)
+    conversation.current_word = new_word
+    conversation.guesses_remaining = GUESSES_PER_ROUND
+    conversation.word_description = ""
+    conversation.described_word = old_word
+    conversation.description_status = 'pending'
+    conversation.description_requested_at = now
+    conversation.description_topic = topic_name or ''
+    conversation.updated_at = now
+
+    conversation_id = conversation.id
+    transaction.on_commit(lambda: schedule_description(conversation_id, old_word, topic_name))
+    return old_word
+
+
+def _lock_game_state(conversation):
+    """Re-read the mutable game fields of ``conversation`` under a row lock."""
+    state = Conversation.objects.select_for_update().values(*GAME_STATE_FIELDS).get(id=conversation.id)
+    for field, value in state.items():
+        setattr(conversation, field, value)
+
+
+def record_guess(conversation, user, topic_name, user_prompt, response_text, start_time,
+                 prompt_tokens=None, metrics=None, cache_hit=False):
+    """Save the bot reply, advance the round if it ended and queue the prompt log.
+
+    Timeouts do not come through here, see ``record_timeout``.
+
+    The whole transition is one transaction: the conversation row is locked,
+    counters are bumped with ``F()`` expressions and only the changed columns
+    are written, so concurrent guesses on the same conversation cannot lose
+    updates. ``conversation`` is updated in place. Returns the saved bot
+    ``Message`` and the round outcome (see ``state_delta``).
+
+    ``prompt_tokens`` is the estimated size of the prompt sent to the model
+    (see ``build_prompt``) and ``metrics`` the model call's ``CallMetrics``;
+    both go to the prompt log. ``cache_hit`` marks a reply replayed from the
+    guess cache, which used no tokens. The exchange is appended to the cached
+    prompt context.
+    """
+    previous_stamp = conversation.updated_at
+    with transaction.atomic():
+        _lock_game_state(conversation)
+        bot_message = Message.objects.create(
+            conversation=conversation,
+            sender='bot',
+            content=response_text
+        )
+        logger.debug("Saved bot message with ID: %s, length: %d", bot_message.id, len(response_text))
+
+        # Check if AI guessed the word OR if user used the backdoor "ORAN"
+        if (matcher_for(conversation.current_word).matches(response_text) or "ORAN" in user_prompt):
+            _end_round(conversation, user, topic_name, won=True)
+            outcome = 'won'
+        elif conversation.guesses_remaining <= 1:
+            # That was the last guess
+            _end_round(conversation, user, topic_name, won=False)
+            outcome = 'lost'
+        else:
+            now = timezone.now()
+            Conversation.objects.filter(id=conversation.id).update(
+                guesses_remaining=F('guesses_remaining') - 1,
+                updated_at=now,
+            )
+            conversation.guesses_remaining -= 1
+            conversation.updated_at = now
+            outcome = 'continue'
+
+    prompt_context.record(conversation, previous_stamp, user_prompt, response_text)
+    if cache_hit:
+        tokens_used = 0
+    elif prompt_tokens is None:
+        tokens_used = len(user_prompt.split()) + len(response_text.split())
+    else:
+        tokens_used = prompt_tokens + estimate_tokens(response_text)
+    prompt_log_writer.log(
+        metrics=metrics,
+        user=user,
+        topic=topic_name or '',
+        prompt=user_prompt,
+        response=response_text,
+        processing_time=time.time() - start_time,
+        tokens_used=tokens_used,
+        cache_hit=cache_hit,
+    )
+    return bot_message, outcome
+
+
+def record_timeout(conversation, user, topic_name, expected_word=None):
+    """End the current round because its timer ran out, without calling the model.
+
+    One transaction, no messages stored. If ``expected_word`` is given and the
+    round has already moved on (a guess ended it first), nothing changes.
+    Returns the outcome: ``timeout``, or ``continue`` if nothing changed.
+    """
+    with transaction.atomic():
+        _lock_game_state(conversation)
+        if expected_word is not None and expected_word != conversation.current_word:
+            return 'continue'
+        _end_round(conversation, user, topic_name, won=False)
+    return 'timeout'
+
+
+def state_delta(conversation, outcome, user_message=None, bot_message=None):
+    """Compact game state sent with the final SSE event of a guess.
+
+    ``outcome`` is ``continue``, ``won``, ``lost`` or ``timeout``; for the
+    last three ``played_word`` is the word of the round that just ended and its
+    description arrives later (``description_status`` is ``pending``).
+    """
+    return {
+        "version": STATE_VERSION,
+        "conversation_id": str(conversation.id),
+        "outcome": outcome,
+        "score": conversation.score,
+        "guesses_remaining": conversation.guesses_remaining,
+        "num_rounds": conversation.num_rounds,
+        "current_word": conversation.current_word,
+        "played_word": conversation.described_word if outcome != 'continue' else None,
+        "word_description": conversation.word_description,
+        "description_status": conversation.description_status,
+        "message_ids": [m.id for m in (user_message, bot_message) if m is not None],
+    }
@@ -0,0 +1,117 @@
+"""
+Reuse of the model's guesses for clues it has already answered.
+
+Players describing the same secret word tend to send the same clues. A reply
+is stored under the normalised (topic, secret word, earlier exchanges of the
+round, clue) and later requests with that key are answered from the cache,
+replayed chunk by chunk through the usual SSE events, without a model call.
+With ``GUESS_CACHE_FUZZY`` the clue is reduced to its sorted set of tokens
+without filler words first, so "He was a Roman general" and "roman general, he
+was" share an entry.
+
+Stored with ``diskcache`` in ``GUESS_CACHE_DIR`` like the description and PDF
+term caches, tagged by topic so one topic can be dropped on its own. Entries
+expire after ``GUESS_CACHE_TTL`` seconds. Caching is turned off entirely with
+``GUESS_CACHE_ENABLED=False`` and per topic with ``GUESS_CACHE_TOPICS`` (only
+these) or ``GUESS_CACHE_EXCLUDE_TOPICS``. Hits and misses are counted by
+diskcache (``stats()``) and every guess's ``PromptLog`` row records whether it
+was a hit.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+
+from .matching import normalize
+from .metrics import note_cache_hit
+from chatbot.disk_cache import DiskCache
+from chatbot.gemini_interface import ERROR_REPLY
+
+CACHE_DIR = os.getenv(
+    'GUESS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'guesses'),
+)
+TTL = int(os.getenv('GUESS_CACHE_TTL', str(7 * 24 * 3600)))
+SIZE_LIMIT = int(os.getenv('GUESS_CACHE_SIZE_LIMIT', str(64 * 1024 * 1024)))
+# Bump when the system prompt changes so old replies are not served
+CACHE_VERSION = 1
+
+FILLER_WORDS = frozenset(
+    "a an the and or but of to in on at for with by from as is are was were be been "
+    "it its this that these those he she they him her them his their i you my your".split()
+)
+
+logger = logging.getLogger(__name__)
+
+disk = DiskCache(CACHE_DIR, SIZE_LIMIT)
+get_cache = disk.get
+stats = disk.stats
+clear = disk.clear
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled_for(topic):
+    if not _setting('GUESS_CACHE_ENABLED', True):
+        return False
+    only = _setting('GUESS_CACHE_TOPICS', ())
+    if only and topic not in only:
+        return False
+    return topic not in _setting('GUESS_CACHE_EXCLUDE_TOPICS', ())
+
+
+def clue_key(clue):
+    """Normalised clue, or its token signature when ``GUESS_CACHE_FUZZY`` is on."""
+    text = ' '.join(normalize(clue).split())
+    if not _setting('GUESS_CACHE_FUZZY', False):
+        return text
+    tokens = sorted({t for t in text.split() if t not in FILLER_WORDS})
+    return ' '.join(tokens) if tokens else text
+
+
+def make_key(topic, word, history, clue):
+    """Cache key of ``clue`` after the round's earlier ``(sender, content)`` messages.
+
+    Returns ``None`` when caching is off for ``topic``.
+    """
+    topic = (topic or '').strip().lower()
+    if not enabled_for(topic):
+        return None
+    context = hashlib.sha256()
+    for sender, content in history:
+        context.update(f"{sender}\x00{' '.join(normalize(content).split())}\x00".encode('utf-8'))
+    return ('guess', CACHE_VERSION, topic, normalize(word), context.hexdigest()[:32], clue_key(clue))
+
+
+def lookup(key):
+    """Return the cached reply as its list of chunks, or ``None``."""
+    if key is None:
+        return None
+    try:
+        chunks = get_cache().get(key)
+    except Exception as e:
+        logger.warning("Guess cache unavailable: %s", e)
+        return None
+    if chunks is not None:
+        note_cache_hit('guess')
+    return chunks
+
+
+def store(key, chunks):
+    """Cache a completed reply; failed or empty ones are not kept."""
+    text = ''.join(chunks)
+    if key is None or not text.strip() or ERROR_REPLY in text:
+        return
+    try:
+        get_cache().set(key, list(chunks), expire=TTL, tag=key[2])
+    except Exception as e:
+        logger.warning("Could not cache guess: %s", e)
+
+
+def clear_topic(topic):
+    """Drop every cached reply for ``topic``; returns how many."""
+    return get_cache().evict(topic.strip().lower())
+
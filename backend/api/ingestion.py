@@ -0,0 +1,335 @@
+"""
+PDF uploads turned into topic word lists, off the request thread.
+
+``upload_terms`` refuses requests over ``PDF_UPLOAD_MAX_BYTES`` by their
+``Content-Length`` before reading them, moves the upload to a temporary file,
+records a ``TermExtractionJob`` and returns its
+id at once; clients poll ``upload-terms/<job_id>/``. The job splits the PDF
+into chunks of ``PDF_PAGES_PER_CHUNK`` pages, extracts terms from up to
+``PDF_EXTRACT_WORKERS`` chunks at a time, merges them with ``merge_terms`` and
+saves the topic. Documents longer than ``PDF_MAX_PAGES`` pages are refused.
+Results are cached by the PDF's SHA-256 (see ``chatbot.term_cache``), so a
+re-upload of the same file is answered without reading or splitting it. A
+chunk whose extraction fails leaves its terms out of the topic and is counted
+in ``chunks_failed``; such partial results are not cached, so uploading the
+file again retries it. The job fails if every chunk does.
+
+Page counting and splitting need ``pypdf``; without it the whole file is sent
+as one chunk and only the size limit applies. Set ``PDF_INGEST_ASYNC=False``
+to run jobs inline (tests, scripts).
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import TermExtractionJob, Topic, WordList
+from .word_pool import topic_slug
+from chatbot import term_cache
+from chatbot.gemini_interface import extract_terms_from_pdf, merge_terms
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except Exception:
+    PdfReader = PdfWriter = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+NO_TERMS_ERROR = "No terms could be extracted from the PDF. Please ensure the PDF contains readable text."
+# Allowance for the multipart boundaries and form fields around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_job_executor = ThreadPoolExecutor(
+    max_workers=_setting('PDF_INGEST_WORKERS', 2),
+    thread_name_prefix='pdf-ingest',
+)
+# Separate pool so jobs waiting on their chunks can never starve them
+_chunk_executor = ThreadPoolExecutor(
+    max_workers=_setting('PDF_EXTRACT_WORKERS', 4),
+    thread_name_prefix='pdf-chunk',
+)
+
+
+def check_upload_size(content_length):
+    """Refuse a request whose ``Content-Length`` already exceeds ``PDF_UPLOAD_MAX_BYTES``.
+
+    Called before the multipart body is parsed, so an oversized upload is not
+    read at all. ``spool_upload`` still checks the file itself.
+    """
+    limit = _setting('PDF_UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+    try:
+        length = int(content_length or 0)
+    except ValueError:
+        return
+    if length > limit + MULTIPART_OVERHEAD:
+        raise UploadRejected(f"PDF is larger than the {limit // (1024 * 1024)} MB limit")
+
+
+def _move(source, path):
+    try:
+        os.replace(source, path)
+    except OSError:
+        return False  # e.g. on another filesystem
+    return True
+
+
+def spool_upload(upload):
+    """Give the job its own temporary file with the contents of ``upload``.
+
+    A file Django already spooled to disk is moved rather than copied; others
+    are written chunk by chunk. Returns the file's path and the SHA-256 hex
+    digest of its contents.
+    """
+    limit = _setting('PDF_UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+    too_large = UploadRejected(f"PDF is larger than the {limit // (1024 * 1024)} MB limit")
+    if upload.size and upload.size > limit:
+        raise too_large
+    fd, path = tempfile.mkstemp(suffix='.pdf', dir=_setting('PDF_INGEST_TMP_DIR', None))
+    os.close(fd)
+    written = 0
+    digest = hashlib.sha256()
+    try:
+        source = getattr(upload, 'temporary_file_path', None)
+        if source is not None and _move(source(), path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(upload.DEFAULT_CHUNK_SIZE), b''):
+                    written += len(chunk)
+                    if written > limit:
+                        raise too_large
+                    digest.update(chunk)
+        else:
+            with open(path, 'wb') as f:
+                for chunk in upload.chunks():
+                    written += len(chunk)
+                    if written > limit:
+                        raise too_large
+                    digest.update(chunk)
+                    f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if not written:
+        os.unlink(path)
+        raise UploadRejected("The uploaded file is empty")
+    return path, digest.hexdigest()
+
+
+def save_topic_terms(user, topic_name, terms):
+    """Store ``terms`` as the word list of ``topic_name`` and record it on the user's ``Topic``.
+
+    Returns the name the list is stored and picked under. A built-in topic of
+    the same name is not replaced; it keeps being the one that is played.
+    """
+    topic_name = topic_name.strip()
+    topic, created = Topic.objects.get_or_create(
+        user=user,
+        topic_name=topic_name,
+        defaults={'related_words': terms}
+    )
+    if not created:
+        # Update related_words if topic already exists
+        topic.related_words = terms
+        topic.save()
+
+    name = topic_slug(topic_name)
+    word_list, created = WordList.objects.get_or_create(
+        name=name,
+        defaults={'source': 'custom', 'words': terms}
+    )
+    if not created:
+        if word_list.source == 'builtin':
+            logger.info("Not replacing built-in topic '%s' with uploaded terms", name)
+            return name
+        word_list.words = terms
+        word_list.save(update_fields=['words', 'updated_at'])
+    logger.info("Saved %d terms to topic '%s'", len(terms), name)
+    return name
+
+
+def _page_ranges(reader):
+    pages = len(reader.pages)
+    step = max(1, _setting('PDF_PAGES_PER_CHUNK', 20))
+    return pages, [(start, min(start + step, pages)) for start in range(0, pages, step)]
+
+
+def _chunk_bytes(reader, path, page_range):
+    if page_range is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    writer = PdfWriter()
+    for i in range(*page_range):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _progress(job_id, futures):
+    done = sum(1 for future in futures if future.done())
+    TermExtractionJob.objects.filter(id=job_id).update(chunks_done=done)
+
+
+def _cached_terms(job):
+    if not job.content_hash:
+        return None
+    try:
+        return term_cache.lookup(job.content_hash, job.max_terms)
+    except Exception as e:
+        logger.warning("PDF term cache unavailable: %s", e)
+        return None
+
+
+def _cache_terms(job, terms):
+    if not job.content_hash:
+        return
+    try:
+        term_cache.store(job.content_hash, job.max_terms, terms)
+    except Exception as e:
+        logger.warning("Could not cache terms of PDF %s: %s", job.content_hash, e)
+
+
+def _fail(job_id, error, chunks_failed=0):
+    logger.warning("Term extraction %s failed: %s", job_id, error)
+    TermExtractionJob.objects.filter(id=job_id).update(status='failed', error=error, chunks_failed=chunks_failed)
+
+
+def _finish(job, terms, from_cache=False, chunks_failed=0):
+    if job.topic_name:
+        save_topic_terms(job.user, job.topic_name, terms)
+    TermExtractionJob.objects.filter(id=job.id).update(
+        status='done', terms=terms, from_cache=from_cache, chunks_failed=chunks_failed,
+    )
+
+
+def run_job(job_id, path):
+    """Extract, merge and save the terms of job ``job_id`` from the PDF at ``path``."""
+    try:
+        job = TermExtractionJob.objects.get(id=job_id)
+        terms = _cached_terms(job)
+        if terms:
+            logger.info("Using %d cached terms for PDF %s", len(terms), job.content_hash)
+            _finish(job, terms, from_cache=True)
+            return
+        if PdfReader is not None:
+            try:
+                reader = PdfReader(path)
+                pages, ranges = _page_ranges(reader)
+            except Exception as e:
+                _fail(job_id, f"Could not read the PDF: {e}")
+                return
+            max_pages = _setting('PDF_MAX_PAGES', 500)
+            if pages > max_pages:
+                _fail(job_id, f"PDF has {pages} pages, the limit is {max_pages}")
+                return
+        else:
+            reader, pages, ranges = None, None, [None]
+        TermExtractionJob.objects.filter(id=job_id).update(status='running', pages=pages, chunks_total=len(ranges))
+
+        # Only PDF_EXTRACT_WORKERS chunks are held in memory at any time. The
+        # chunk threads only call the model; progress is written from here.
+        slots = threading.Semaphore(_setting('PDF_EXTRACT_WORKERS', 4))
+        futures = []
+        for page_range in ranges:
+            slots.acquire()
+            _progress(job_id, futures)
+            try:
+                data = _chunk_bytes(reader, path, page_range)
+            except Exception:
+                slots.release()
+                raise
+            future = _chunk_executor.submit(extract_terms_from_pdf, data, max_terms=job.max_terms, raise_errors=True)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        for _ in as_completed(futures):
+            _progress(job_id, futures)
+        term_lists, failed, error = [], 0, None
+        for i, future in enumerate(futures):
+            try:
+                term_lists.append(future.result())
+            except Exception as e:
+                failed += 1
+                error = e
+                logger.warning("Chunk %d of PDF %s failed: %s", i + 1, job.content_hash, e)
+        terms = merge_terms(term_lists, job.max_terms)
+        logger.info("Extracted %d terms from PDF (%d chunks, %d failed)", len(terms), len(ranges), failed)
+
+        if failed == len(futures):
+            _fail(job_id, f"Failed to extract terms: {error}", chunks_failed=failed)
+            return
+        if not terms:
+            _fail(job_id, NO_TERMS_ERROR, chunks_failed=failed)
+            return
+        if not failed:
+            _cache_terms(job, terms)
+        _finish(job, terms, chunks_failed=failed)
+    except Exception as e:
+        _fail(job_id, f"Failed to extract terms: {e}")
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        close_old_connections()
+
+
+def start_job(user, upload, topic_name, max_terms):
+    """Spool ``upload`` and queue its extraction; returns the ``TermExtractionJob``.
+
+    Raises ``UploadRejected`` if the upload is empty or too large.
+    """
+    path, content_hash = spool_upload(upload)
+    try:
+        job = TermExtractionJob.objects.create(
+            user=user,
+            topic_name=(topic_name or '').strip(),
+            max_terms=max(1, min(max_terms, 150)),
+            content_hash=content_hash,
+        )
+    except BaseException:
+        os.unlink(path)
+        raise
+    terms = _cached_terms(job)
+    if terms:
+        # Seen this PDF before: answer right away, no job thread needed
+        os.unlink(path)
+        _finish(job, terms, from_cache=True)
+        job.refresh_from_db()
+    elif not _setting('PDF_INGEST_ASYNC', True):
+        run_job(job.id, path)
+        job.refresh_from_db()
+    else:
+        _job_executor.submit(run_job, job.id, path)
+    return job
+
+
+def job_status(job):
+    data = {
+        "job_id": str(job.id),
+        "status": job.status,
+        "topic_name": job.topic_name or None,
+        "pages": job.pages,
+        "chunks_total": job.chunks_total,
+        "chunks_done": job.chunks_done,
+        "chunks_failed": job.chunks_failed,
+        "cached": job.from_cache,
+    }
+    if job.status == 'done':
+        data["terms"] = job.terms
+    if job.status == 'failed':
+        data["error"] = job.error
+    return data
@@ -0,0 +1,261 @@
+import io
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import diskcache
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from chatbot import backends, description_cache, term_cache
+from api import guess_cache
+from api.ingestion import PdfWriter
+from api.models import Conversation
+from api.prompt_logs import prompt_log_writer
+from api.word_pool import word_pool
+
+ENDPOINTS = ['chat_stream', 'chat_demo', 'conversation_detail', 'conversation_list', 'upload_terms']
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _summary(samples, wall_time):
+    latencies = [s['latency'] for s in samples if s['ok']]
+    ttfb = [s['ttfb'] for s in samples if s['ok'] and s['ttfb'] is not None]
+    queries = [s['queries'] for s in samples if s['ok']]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not s['ok']),
+        "throughput_rps": len(samples) / wall_time if wall_time else None,
+        "latency_ms": {
+            "mean": statistics.mean(latencies) * 1000 if latencies else None,
+            "p50": (_percentile(latencies, 50) or 0) * 1000,
+            "p95": (_percentile(latencies, 95) or 0) * 1000,
+            "p99": (_percentile(latencies, 99) or 0) * 1000,
+        },
+        "ttfb_ms": {
+            "p50": _percentile(ttfb, 50) * 1000 if ttfb else None,
+            "p95": _percentile(ttfb, 95) * 1000 if ttfb else None,
+            "p99": _percentile(ttfb, 99) * 1000 if ttfb else None,
+        },
+        "queries_per_request": {
+            "mean": statistics.mean(queries) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+    }
+
+
+def _sample_pdf(index, pages=3):
+    """A distinct small PDF per request, so none is answered from the term cache."""
+    if PdfWriter is None:
+        return f"%PDF-1.4\n% benchmark {index}\n%%EOF\n".encode()
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    writer.add_metadata({'/Title': f"benchmark {index}"})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _database_info():
+    info = {"vendor": connection.vendor, "conn_max_age": connection.settings_dict.get('CONN_MAX_AGE')}
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f"PRAGMA {pragma}")
+                info[pragma] = cursor.fetchone()[0]
+        info["transaction_mode"] = connection.settings_dict['OPTIONS'].get('transaction_mode')
+    else:
+        info["pool"] = bool(connection.settings_dict['OPTIONS'].get('pool'))
+    return info
+
+
+def _close_connection(barrier):
+    try:
+        barrier.wait(timeout=10)
+    except threading.BrokenBarrierError:
+        pass
+    connection.close()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API hot paths against the local model backend and write JSON results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                            help="Endpoint(s) to drive (default: all)")
+        parser.add_argument('--requests', type=int, default=100, help="Requests per endpoint")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients")
+        parser.add_argument('--latency', type=float, default=0.2, help="Local model time to first chunk (s)")
+        parser.add_argument('--tokens-per-second', type=float, default=50.0, help="Local model streaming rate")
+        parser.add_argument('--tokens-per-chunk', type=int, default=4, help="Tokens per streamed chunk")
+        parser.add_argument('--topic', default='ancient_history')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--sqlite-memory', action='store_true',
+                            help="Use an in-memory SQLite test database instead of a file (no WAL, no busy timeout)")
+        parser.add_argument('--guess-cache', action='store_true',
+                            help="Answer repeated clues from the guess cache (off by default)")
+        parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON results")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        cache_dir = tempfile.TemporaryDirectory()
+        if connection.vendor == 'sqlite' and not options['sqlite_memory']:
+            # A file, like production, so journal mode and locking behave the same
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(cache_dir.name, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Keep fake descriptions and extracted terms out of the real caches
+        saved = []
+        for module, name in ((description_cache, 'descriptions'), (term_cache, 'pdf_terms'), (guess_cache, 'guesses')):
+            cache = diskcache.Cache(os.path.join(cache_dir.name, name), statistics=True)
+            saved.append((module.disk, module.disk.replace(cache)))
+        previous_backend = backends.set_backend(backends.LocalBackend(
+            latency=options['latency'],
+            tokens_per_second=options['tokens_per_second'],
+            tokens_per_chunk=options['tokens_per_chunk'],
+            words=word_pool.words(options['topic']),
+            seed=options['seed'],
+        ))
+        try:
+            # Time the whole PDF pipeline, not just queueing the job
+            with override_settings(PDF_INGEST_ASYNC=False, GUESS_CACHE_ENABLED=options['guess_cache']):
+                results = self._run(options)
+            if options['guess_cache']:
+                results['guess_cache'] = guess_cache.stats()
+            prompt_log_writer.flush()
+            results['prompt_log_writer'] = prompt_log_writer.stats()
+        finally:
+            for disk, previous in saved:
+                disk.replace(previous)
+            backends.set_backend(previous_backend)
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            cache_dir.cleanup()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write("database: " + ", ".join(f"{k}={v}" for k, v in results['database'].items()))
+        for name, summary in results['endpoints'].items():
+            lat = summary['latency_ms']
+            self.stdout.write(
+                f"{name:20} {summary['requests']:5d} req  {summary['errors']:3d} err  "
+                f"{summary['throughput_rps']:8.1f} req/s  p50 {lat['p50']:7.1f}ms  "
+                f"p95 {lat['p95']:7.1f}ms  p99 {lat['p99']:7.1f}ms  "
+                f"q/req {summary['queries_per_request']['mean'] or 0:5.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _setup_clients(self, concurrency, topic):
+        clients = []
+        for i in range(concurrency):
+            user = User.objects.create_user(f'bench{i}', f'bench{i}@example.com', 'benchmark')
+            token = Token.objects.create(user=user)
+            conversation = Conversation.objects.create(
+                user=user, title="Benchmark", current_word=word_pool.pick(topic)[0]
+            )
+            clients.append({
+                "headers": {"HTTP_AUTHORIZATION": f"Token {token.key}"},
+                "conversation_id": conversation.id,
+            })
+        return clients
+
+    def _request(self, endpoint, client, slot, topic):
+        c = Client()
+        headers = slot['headers']
+        if endpoint == 'chat_stream':
+            return c.post(
+                f'/api/chat-stream/{topic}/',
+                json.dumps({"conversation_id": str(slot['conversation_id']), "prompt": "famous Roman general"}),
+                content_type='application/json', **headers,
+            )
+        if endpoint == 'chat_demo':
+            return c.post('/api/chat-demo/', {"prompt": "famous Roman general"}, content_type='application/json')
+        if endpoint == 'conversation_detail':
+            return c.get(f"/api/conversations/{slot['conversation_id']}/", **headers)
+        if endpoint == 'conversation_list':
+            return c.get('/api/conversations/', **headers)
+        if endpoint == 'upload_terms':
+            pdf = io.BytesIO(_sample_pdf(client))
+            pdf.name = 'benchmark.pdf'
+            return c.post('/api/upload-terms/', {"file": pdf, "topic_name": f"bench_{client}"}, **headers)
+        raise ValueError(endpoint)
+
+    def _one(self, endpoint, index, slot, topic):
+        sample = {"ok": False, "latency": None, "ttfb": None, "queries": None}
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            try:
+                response = self._request(endpoint, index, slot, topic)
+                saved = True
+                if response.streaming:
+                    last = b""
+                    for chunk in response.streaming_content:
+                        if sample['ttfb'] is None and chunk:
+                            sample['ttfb'] = time.perf_counter() - start
+                        last = chunk or last
+                    response.close()
+                    # The guess is written after the stream; a failed write sends no state
+                    saved = endpoint != 'chat_stream' or b'"state": null' not in last
+                sample['ok'] = response.status_code < 400 and saved
+            except Exception as e:
+                self.stderr.write(f"{endpoint} request failed: {e}")
+            sample['latency'] = time.perf_counter() - start
+        sample['queries'] = len(queries)
+        return sample
+
+    def _run(self, options):
+        concurrency = max(1, options['concurrency'])
+        topic = options['topic']
+        slots = self._setup_clients(concurrency, topic)
+        results = {
+            "revision": _git_revision(),
+            "timestamp": time.time(),
+            "config": {k: options[k] for k in (
+                'requests', 'concurrency', 'latency', 'tokens_per_second', 'tokens_per_chunk', 'topic'
+            )},
+            "database": _database_info(),
+            "endpoints": {},
+        }
+
+        def worker(endpoint, index):
+            try:
+                return self._one(endpoint, index, slots[index % concurrency], topic)
+            finally:
+                # What a server does after each request: keeps persistent connections
+                close_old_connections()
+
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                start = time.perf_counter()
+                samples = list(pool.map(lambda i: worker(endpoint, i), range(options['requests'])))
+                wall_time = time.perf_counter() - start
+                # One task per thread, so every thread closes its own connection
+                barrier = threading.Barrier(concurrency)
+                list(pool.map(lambda _: _close_connection(barrier), range(concurrency)))
+            results['endpoints'][endpoint] = _summary(samples, wall_time)
+        return results
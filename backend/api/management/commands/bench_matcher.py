@@ -0,0 +1,107 @@
+import random
+import re
+import difflib
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.matching import WordMatcher
+from api.word_pool import word_pool
+
+
+def legacy_is_near_match(text, target, token_subset=True, ratio_threshold=0.7):
+    """The matcher that used to live inside chat_stream, kept as the baseline."""
+    def _normalize(s):
+        return re.sub(r'[^a-z0-9\s]', '', (s or "").lower()).strip()
+
+    if not target:
+        return False
+    text_n = _normalize(text)
+    target_n = _normalize(target)
+
+    if target_n and target_n in text_n:
+        return True
+
+    if token_subset:
+        t_tokens = [t for t in target_n.split() if t]
+        txt_tokens = [t for t in text_n.split() if t]
+        if t_tokens and set(t_tokens).issubset(set(txt_tokens)):
+            return True
+
+    if difflib.SequenceMatcher(None, target_n, text_n).ratio() >= ratio_threshold:
+        return True
+
+    tlen = len(target_n.split())
+    txt_tokens = text_n.split()
+    if tlen > 0 and len(txt_tokens) >= 1:
+
+        for w in range(max(1, tlen), min(len(txt_tokens), tlen + 3) + 1):
+            for i in range(0, len(txt_tokens) - w + 1):
+                window = " ".join(txt_tokens[i:i+w])
+                if difflib.SequenceMatcher(None, target_n, window).ratio() >= ratio_threshold:
+                    return True
+    return False
+
+
+def _mutate(word, rng):
+    chars = list(word)
+    if len(chars) > 3:
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return "".join(chars)
+
+
+def _guesses(word, others, rng):
+    return [
+        word,
+        word.upper() + "!",
+        _mutate(word, rng),
+        f"I think it is {word}",
+        word.split()[-1],
+        rng.choice(others),
+        "I don't know",
+        " ".join(rng.choice(others) for _ in range(3)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare api.matching.WordMatcher against the legacy is_near_match"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', action='append', help="Topic(s) to draw words from")
+        parser.add_argument('--words', type=int, default=300, help="Number of secret words to sample")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        pool = []
+        for topic in options['topic'] or ['ancient_history', 'nba', 'programming_languages', 'countries']:
+            pool.extend(word_pool.words(topic))
+        words = rng.sample(pool, min(options['words'], len(pool)))
+        cases = [(word, guess) for word in words for guess in _guesses(word, pool, rng)]
+
+        start = time.perf_counter()
+        expected = [legacy_is_near_match(word, guess) for word, guess in cases]
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matchers = {word: WordMatcher(word) for word in words}
+        setup_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = [matchers[word].matches(guess) for word, guess in cases]
+        new_time = time.perf_counter() - start
+
+        mismatches = [case for case, a, b in zip(cases, expected, actual) if a != b]
+        n = len(cases)
+        self.stdout.write(f"{n} comparisons over {len(words)} words")
+        self.stdout.write(f"  legacy is_near_match : {legacy_time * 1e6 / n:8.1f} us/guess")
+        self.stdout.write(f"  WordMatcher.matches  : {new_time * 1e6 / n:8.1f} us/guess "
+                          f"(+{setup_time * 1e6 / len(words):.1f} us/word setup)")
+        self.stdout.write(f"  speedup              : {legacy_time / new_time:8.1f}x")
+        if mismatches:
+            for word, guess in mismatches[:10]:
+                self.stderr.write(f"  mismatch: word={word!r} guess={guess!r}")
+            self.stderr.write(self.style.ERROR(f"{len(mismatches)} results differ from the legacy matcher"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All results match the legacy matcher"))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api import guess_cache
+from api.models import PromptLog
+
+
+class Command(BaseCommand):
+    help = "Drop cached guesses (all of them, or by topic) and report the guess cache hit rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', action='append', dest='topics',
+                            help="Topic whose cached guesses to drop (repeatable)")
+        parser.add_argument('--stats', action='store_true', help="Only print statistics")
+        parser.add_argument('--days', type=float, default=1.0,
+                            help="Window of the per-topic hit rates, from the prompt logs (default: 1)")
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            if options['topics']:
+                removed = sum(guess_cache.clear_topic(t) for t in options['topics'])
+                self.stdout.write(f"Removed {removed} cached guesses")
+            else:
+                guess_cache.clear()
+                self.stdout.write("Cleared the guess cache")
+
+        since = timezone.now() - timedelta(days=options['days'])
+        rows = (
+            PromptLog.objects.filter(created_at__gte=since).exclude(topic='')
+            .values('topic')
+            .annotate(guesses=Count('id'), hits=Count('id', filter=Q(cache_hit=True)))
+            .order_by('-guesses')
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['topic']}: {row['hits']}/{row['guesses']} guesses from cache "
+                f"({row['hits'] / row['guesses']:.1%})"
+            )
+
+        stats = guess_cache.stats()
+        hit_rate = "n/a" if stats['hit_rate'] is None else f"{stats['hit_rate']:.1%}"
+        self.stdout.write(self.style.SUCCESS(
+            f"Guess cache: {stats['entries']} entries, {stats['volume']} bytes, "
+            f"{stats['hits']} hits, {stats['misses']} misses, hit rate {hit_rate}"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from chatbot import term_cache
+
+
+class Command(BaseCommand):
+    help = "Drop cached PDF term extraction results (all of them, or by PDF hash)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hash', action='append', dest='hashes',
+                            help="SHA-256 of a PDF whose results to drop (repeatable)")
+        parser.add_argument('--stats', action='store_true', help="Only print cache statistics")
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            if options['hashes']:
+                removed = sum(term_cache.invalidate(h.strip().lower()) for h in options['hashes'])
+                self.stdout.write(f"Removed {removed} cached results")
+            else:
+                term_cache.clear()
+                self.stdout.write("Cleared the PDF term cache")
+
+        stats = term_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"PDF term cache: {stats['entries']} entries, {stats['volume']} bytes, "
+            f"{stats['hits']} hits, {stats['misses']} misses"
+        ))
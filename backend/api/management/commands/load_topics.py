@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api.word_pool import TOPICS_DIR, import_topic_files, word_pool
+
+LEGACY_CUSTOM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'custom_topics')
+
+
+class Command(BaseCommand):
+    help = "Import topic word lists from .txt files (one word per line) into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=TOPICS_DIR, help="Directory of built-in topic files")
+        parser.add_argument('--custom-dir', nargs='?', const=LEGACY_CUSTOM_DIR,
+                            help="Also import uploaded topics from this directory "
+                                 f"(default when given without a value: {LEGACY_CUSTOM_DIR})")
+        parser.add_argument('--keep-existing', action='store_true', help="Do not overwrite lists already stored")
+
+    def handle(self, *args, **options):
+        replace = not options['keep_existing']
+        builtin = import_topic_files(options['dir'], 'builtin', replace=replace)
+        self.stdout.write(f"Imported {builtin} built-in topics from {options['dir']}")
+        if options['custom_dir']:
+            custom = import_topic_files(options['custom_dir'], 'custom', replace=replace)
+            self.stdout.write(f"Imported {custom} custom topics from {options['custom_dir']}")
+        word_pool.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"{len(word_pool.topic_names())} topics available"))
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.word_pool import word_pool
+from chatbot import description_cache
+from chatbot.gemini_interface import get_word_description
+
+
+class Command(BaseCommand):
+    help = "Pre-generate the cached description of every word in every topic"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', action='append', help="Only warm this topic (repeatable)")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent model calls")
+        parser.add_argument('--stats', action='store_true', help="Only print cache statistics")
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            jobs = []
+            for topic in options['topic'] or word_pool.topic_names():
+                for word in word_pool.words(topic):
+                    if description_cache.lookup(word, topic) is None:
+                        jobs.append((word, topic))
+            self.stdout.write(f"Generating {len(jobs)} missing descriptions")
+
+            with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                for done, _ in enumerate(pool.map(lambda job: get_word_description(*job), jobs), 1):
+                    if done % 100 == 0:
+                        self.stdout.write(f"  {done}/{len(jobs)}")
+
+        stats = description_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Description cache: {stats['entries']} entries, {stats['volume']} bytes, "
+            f"{stats['hits']} hits, {stats['misses']} misses"
+        ))
@@ -0,0 +1,107 @@
+"""
+Fuzzy matching of the model's guess against the secret word.
+
+``WordMatcher(word).matches(guess)`` accepts and rejects exactly what the
+original ``is_near_match(word, guess)`` did, but everything that depends only
+on the word (normalised form, token set, every token window with its length
+and character counts) is computed once, when the word is selected. At guess
+time each ``SequenceMatcher`` comparison is first checked against two cheap
+upper bounds of its ratio (length-based, then character-multiset overlap) and
+is only run when the bound can still reach the threshold, so the cost per
+guess stays bounded instead of growing with every sliding window.
+"""
+import re
+import difflib
+from collections import Counter
+from functools import lru_cache
+
+RATIO_THRESHOLD = 0.7
+
+_strip = re.compile(r'[^a-z0-9\s]')
+
+
+def normalize(s):
+    return _strip.sub('', (s or "").lower()).strip()
+
+
+def _ratio(matches, length):
+    # Same arithmetic as difflib's ratio(), so bounds compare exactly
+    return 2.0 * matches / length if length else 1.0
+
+
+class _Signature:
+    __slots__ = ('text', 'length', 'counts')
+
+    def __init__(self, text):
+        self.text = text
+        self.length = len(text)
+        self.counts = Counter(text)
+
+
+class WordMatcher:
+    def __init__(self, word, token_subset=True, ratio_threshold=RATIO_THRESHOLD):
+        self.word = word
+        self.token_subset = token_subset
+        self.ratio_threshold = ratio_threshold
+        self.normalized = normalize(word)
+        self.tokens = self.normalized.split()
+        self.token_set = frozenset(self.tokens)
+        self.signature = _Signature(self.normalized)
+        # Distinct token windows of the word, by width
+        self.windows = {}
+        n = len(self.tokens)
+        for w in range(1, n + 1):
+            seen = {}
+            for i in range(0, n - w + 1):
+                window = " ".join(self.tokens[i:i+w])
+                if window not in seen:
+                    seen[window] = _Signature(window)
+            self.windows[w] = tuple(seen.values())
+
+    def _similar(self, guess_n, guess_counts, signature):
+        threshold = self.ratio_threshold
+        length = len(guess_n) + signature.length
+        if _ratio(min(len(guess_n), signature.length), length) < threshold:
+            return False
+        overlap = sum(min(count, signature.counts[ch]) for ch, count in guess_counts.items())
+        if _ratio(overlap, length) < threshold:
+            return False
+        return difflib.SequenceMatcher(None, guess_n, signature.text).ratio() >= threshold
+
+    def matches(self, guess):
+        """True if ``guess`` names the word closely enough."""
+        if not guess:
+            return False
+        guess_n = normalize(guess)
+
+        if guess_n and guess_n in self.normalized:
+            return True
+
+        guess_tokens = guess_n.split()
+        if self.token_subset and guess_tokens and self.token_set.issuperset(guess_tokens):
+            return True
+
+        guess_counts = Counter(guess_n)
+        if self._similar(guess_n, guess_counts, self.signature):
+            return True
+
+        tlen = len(guess_tokens)
+        if tlen > 0 and self.tokens:
+            for w in range(max(1, tlen), min(len(self.tokens), tlen + 3) + 1):
+                for signature in self.windows[w]:
+                    if self._similar(guess_n, guess_counts, signature):
+                        return True
+        return False
+
+
+@lru_cache(maxsize=4096)
+def matcher_for(word):
+    """Shared, precomputed matcher for ``word`` (default settings)."""
+    return WordMatcher(word)
+
+
+def is_near_match(text, target, token_subset=True, ratio_threshold=RATIO_THRESHOLD):
+    """Drop-in replacement for the old helper: does ``target`` name ``text``?"""
+    if token_subset and ratio_threshold == RATIO_THRESHOLD:
+        return matcher_for(text).matches(target)
+    return WordMatcher(text, token_subset, ratio_threshold).matches(target)
@@ -0,0 +1,353 @@
+"""
+Request and model-call metrics in the Prometheus text format.
+
+``InstrumentationMiddleware`` times every request and, through a database
+execute wrapper, counts its queries. It also records the time to the first
+byte of streamed responses. The model client reports each call to
+``observe_llm_call``. All of it is kept per process in the counters and
+histograms below and served by ``metrics_view`` (``/metrics``). Cache
+statistics are read when the endpoint is scraped, so they cost nothing per
+request.
+
+The figures are per process. Scrape every worker, or run one per container.
+``METRICS_ENABLED=False`` removes the middleware and the endpoint entirely.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger('api.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register ``fn() -> [(name, kind, help, [(labels, value)])]``, called at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", collect.__name__, e)
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'http_requests_total', "Requests by view, method and status", ('view', 'method', 'status'))
+request_duration = registry.histogram(
+    'http_request_duration_seconds', "Request latency, to the last byte for streams", ('view',))
+request_ttfb = registry.histogram(
+    'http_time_to_first_byte_seconds', "Time to the first streamed byte", ('view',))
+request_queries = registry.histogram(
+    'http_request_db_queries', "Database queries per request", ('view',), buckets=QUERY_BUCKETS)
+request_db_time = registry.histogram(
+    'http_request_db_seconds', "Time spent in database queries per request", ('view',))
+llm_calls = registry.counter(
+    'llm_calls_total', "Model calls by kind and outcome (ok or the error type)", ('kind', 'outcome'))
+llm_duration = registry.histogram(
+    'llm_call_duration_seconds', "Model call duration, retries included", ('kind',))
+llm_first_chunk = registry.histogram(
+    'llm_first_chunk_seconds', "Time to the model's first streamed chunk", ('kind',))
+llm_retries = registry.counter('llm_retries_total', "Model call attempts beyond the first", ('kind',))
+llm_tokens = registry.counter('llm_tokens_total', "Tokens reported by the model", ('type',))
+
+
+@registry.collector
+def _cache_stats():
+    from chatbot import description_cache, term_cache
+    from . import guess_cache
+    from .authentication import token_cache
+
+    stats = {'auth_token': token_cache.stats()}
+    for name, module in (('description', description_cache), ('pdf_terms', term_cache), ('guess', guess_cache)):
+        if module.disk.cache is not None:  # never open a cache just to report on it
+            stats[name] = module.stats()
+    return [
+        ('cache_hits_total', 'counter', "Cache hits", [({'cache': n}, s['hits']) for n, s in stats.items()]),
+        ('cache_misses_total', 'counter', "Cache misses", [({'cache': n}, s['misses']) for n, s in stats.items()]),
+        ('cache_entries', 'gauge', "Entries held", [({'cache': n}, s['entries']) for n, s in stats.items()]),
+    ]
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'db_time', 'first_byte', 'llm_calls', 'llm_time', 'cache_hits')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.first_byte = None
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.cache_hits = []
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def note_cache_hit(cache):
+    """Record a cache hit on the current request's log line."""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits.append(cache)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if getattr(settings, 'METRICS_ENABLED', True) and _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def observe_llm_call(kind, metrics, error=None):
+    """``GeminiClient`` observer: one finished (or rejected) model call."""
+    outcome = 'ok' if error is None else type(error).__name__
+    llm_calls.inc(kind=kind, outcome=outcome)
+    if metrics.total_time is not None:
+        llm_duration.observe(metrics.total_time, kind=kind)
+    if metrics.first_chunk_time is not None:
+        llm_first_chunk.observe(metrics.first_chunk_time, kind=kind)
+    if metrics.attempts > 1:
+        llm_retries.inc(metrics.attempts - 1, kind=kind)
+    if metrics.prompt_tokens:
+        llm_tokens.inc(metrics.prompt_tokens, type='prompt')
+    if metrics.completion_tokens:
+        llm_tokens.inc(metrics.completion_tokens, type='completion')
+    stats = _current.get()
+    if stats is not None:
+        stats.llm_calls += 1
+        stats.llm_time += metrics.total_time or 0.0
+
+
+def _finish(request, response, stats):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else 'unmatched'
+    duration = time.perf_counter() - stats.start
+    requests_total.inc(view=view, method=request.method, status=response.status_code)
+    request_duration.observe(duration, view=view)
+    request_queries.observe(stats.queries, view=view)
+    request_db_time.observe(stats.db_time, view=view)
+    if stats.first_byte is not None:
+        request_ttfb.observe(stats.first_byte, view=view)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "request view=%s method=%s status=%s duration=%.4f queries=%d db_time=%.4f ttfb=%s "
+            "llm_calls=%d llm_time=%.4f cache_hits=%s",
+            view, request.method, response.status_code, duration, stats.queries, stats.db_time,
+            'n/a' if stats.first_byte is None else f"{stats.first_byte:.4f}",
+            stats.llm_calls, stats.llm_time, ','.join(stats.cache_hits) or '-',
+            extra={
+                'view': view, 'status': response.status_code, 'duration': duration,
+                'queries': stats.queries, 'db_time': stats.db_time, 'ttfb': stats.first_byte,
+                'llm_calls': stats.llm_calls, 'llm_time': stats.llm_time, 'cache_hits': stats.cache_hits,
+            },
+        )
+
+
+def _stream(content, request, response, stats):
+    # The body is produced after the middleware returns: keep attributing
+    # queries and model calls to this request while each chunk is made
+    try:
+        iterator = iter(content)
+        while True:
+            token = _current.set(stats)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _current.reset(token)
+            if stats.first_byte is None and chunk:
+                stats.first_byte = time.perf_counter() - stats.start
+            yield chunk
+    finally:
+        _finish(request, response, stats)
+
+
+async def _astream(content, request, response, stats):
+    try:
+        iterator = content.__aiter__()
+        while True:
+            token = _current.set(stats)
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            if stats.first_byte is None and chunk:
+                stats.first_byte = time.perf_counter() - stats.start
+            yield chunk
+    finally:
+        _finish(request, response, stats)
+
+
+class InstrumentationMiddleware:
+    """Per-request latency, query count and time, time to first byte and model calls."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _wrap(self, request, response, stats):
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _astream(response.streaming_content, request, response, stats)
+            else:
+                response.streaming_content = _stream(response.streaming_content, request, response, stats)
+        else:
+            _finish(request, response, stats)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._wrap(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._wrap(request, response, stats)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint. Set ``METRICS_TOKEN`` to require ``Authorization: Bearer <token>``."""
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404()
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 00:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_conversation_description_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='conv_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='msg_conv_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promptlog',
+            index=models.Index(fields=['user', '-created_at'], name='promptlog_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_term_extraction_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='termextractionjob',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='termextractionjob',
+            name='from_cache',
+            field=models.BooleanField(default=False),
+        ),
+    ]
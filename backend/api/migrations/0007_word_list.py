@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_term_job_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('source', models.CharField(choices=[('builtin', 'Built in'), ('custom', 'Custom')], default='custom', max_length=10)),
+                ('listed', models.BooleanField(default=True)),
+                ('words', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
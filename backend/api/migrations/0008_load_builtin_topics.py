@@ -0,0 +1,40 @@
+import os
+
+from django.db import migrations
+
+# The loading code is copied here rather than imported from api.word_pool, so
+# later changes to that module cannot break migrating a fresh database.
+TOPICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'topics')
+# Shipped lists that are not game topics
+UNLISTED = {'famous_icons'}
+
+
+def load_builtin_topics(apps, schema_editor):
+    WordList = apps.get_model('api', 'WordList')
+    if not os.path.isdir(TOPICS_DIR):
+        return
+    for filename in sorted(os.listdir(TOPICS_DIR)):
+        if not filename.endswith('.txt'):
+            continue
+        name = filename[:-4]
+        with open(os.path.join(TOPICS_DIR, filename), "r", encoding="utf-8") as f:
+            words = [line.strip() for line in f if line.strip()]
+        WordList.objects.update_or_create(
+            name=name,
+            defaults={'source': 'builtin', 'listed': name not in UNLISTED, 'words': words},
+        )
+
+
+def unload_builtin_topics(apps, schema_editor):
+    apps.get_model('api', 'WordList').objects.filter(source='builtin').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_word_list'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_builtin_topics, unload_builtin_topics),
+    ]
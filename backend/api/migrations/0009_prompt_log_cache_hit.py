@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_load_builtin_topics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptlog',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_prompt_log_cache_hit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='termextractionjob',
+            name='chunks_failed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_term_job_chunks_failed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversation',
+            name='guesses_remaining',
+            field=models.PositiveIntegerField(default=3),
+        ),
+    ]
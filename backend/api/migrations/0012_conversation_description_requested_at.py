@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_conversation_guesses_per_round'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='description_requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='description_topic',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -25,6 +27,22 @@ class Topic(models.Model): #sub-category
         return self.topic_name
 
 
+class WordList(models.Model):
+    """The words of one playable topic, built in (api/topics/*.txt) or uploaded."""
+    name = models.CharField(max_length=100, unique=True)  # lowercase, spaces as underscores
+    source = models.CharField(
+        max_length=10,
+        choices=[('builtin', 'Built in'), ('custom', 'Custom')],
+        default='custom'
+    )
+    listed = models.BooleanField(default=True)  # False for lists that are not game topics
+    words = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Conversation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
     title = models.CharField(max_length=255)
@@ -34,7 +52,15 @@ class Conversation(models.Model):
     score = models.PositiveIntegerField(default=0)
     current_word = models.CharField(max_length=100, default="")
     word_description = models.TextField(default="", blank=True)  # AI-generated description when round ends
-    guesses_remaining = models.PositiveIntegerField(default=4)
+    described_word = models.CharField(max_length=100, default="", blank=True)  # Word that word_description is about
+    description_status = models.CharField(
+        max_length=10,
+        choices=[('none', 'None'), ('pending', 'Pending'), ('ready', 'Ready')],
+        default='none'
+    )
+    description_requested_at = models.DateTimeField(null=True, blank=True)  # When the pending description was queued
+    description_topic = models.CharField(max_length=100, default="", blank=True)  # Topic described_word was played in
+    guesses_remaining = models.PositiveIntegerField(default=3)  # game.GUESSES_PER_ROUND
     num_rounds = models.PositiveIntegerField(default=5)
     topic = models.ForeignKey(
         Topic,
@@ -49,10 +75,16 @@ class Conversation(models.Model):
             return f"{self.title} - {self.user.username}"
         else:
             return f"{self.title} - Demo"
+
+    class Meta:
+        indexes = [
+            # conversation_list: a user's conversations, most recently updated first
+            models.Index(fields=['user', '-updated_at', '-id'], name='conv_user_updated_idx'),
+        ]
             
     def save(self, *args, **kwargs):
         # Mark conversations without users as demos
-        if not self.user:
+        if self.user_id is None:
             self.is_demo = True
         super().save(*args, **kwargs)
 
@@ -67,18 +99,66 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Chat history: a conversation's messages by time (LIMIT 10 newest, or paged)
+            models.Index(fields=['conversation', 'created_at', 'id'], name='msg_conv_created_idx'),
+        ]
 
 class PromptLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='prompt_logs')
     prompt = models.TextField()
     response = models.TextField()
+    topic = models.CharField(max_length=100, blank=True, default='')
     tokens_used = models.IntegerField(default=0)
     processing_time = models.FloatField(default=0.0)  # in seconds
+    # As reported by the model; null when it did not report them
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    completion_tokens = models.IntegerField(null=True, blank=True)
+    # Model call timings in seconds; processing_time also covers our own work
+    first_chunk_time = models.FloatField(null=True, blank=True)
+    max_chunk_gap = models.FloatField(null=True, blank=True)
+    mean_chunk_gap = models.FloatField(null=True, blank=True)
+    model_time = models.FloatField(null=True, blank=True)
+    # Reply replayed from the guess cache, no model call made
+    cache_hit = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Prompt log {self.id} by {self.user.username if self.user else 'Anonymous'}"
 
+    class Meta:
+        indexes = [
+            # A user's most recent prompt logs; the prompt text itself is too
+            # large to index, so it is matched against the few newest rows
+            models.Index(fields=['user', '-created_at'], name='promptlog_user_created_idx'),
+            models.Index(fields=['topic', '-created_at'], name='promptlog_topic_created_idx'),
+        ]
+
+class TermExtractionJob(models.Model):
+    """One PDF upload being turned into a topic's word list, see ``ingestion``."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='term_jobs')
+    topic_name = models.CharField(max_length=100, blank=True, default='')
+    max_terms = models.PositiveIntegerField(default=50)
+    status = models.CharField(
+        max_length=10,
+        choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')],
+        default='queued'
+    )
+    content_hash = models.CharField(max_length=64, blank=True, default='')  # SHA-256 of the PDF
+    from_cache = models.BooleanField(default=False)
+    pages = models.PositiveIntegerField(null=True, blank=True)  # unknown without pypdf
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    chunks_failed = models.PositiveIntegerField(default=0)  # left out of ``terms``
+    terms = models.JSONField(default=list)
+    error = models.TextField(default="", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Term extraction {self.id} ({self.status})"
+
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, **kwargs):
     UserProfile.objects.get_or_create(user=instance)
\ No newline at end of file
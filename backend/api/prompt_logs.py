@@ -0,0 +1,142 @@
+"""
+Buffered, batched writes of ``PromptLog`` rows.
+
+Request handlers call ``prompt_log_writer.log(...)``, which only builds an
+unsaved ``PromptLog`` and puts it on a bounded in-memory queue. A daemon thread
+drains the queue and inserts rows with ``bulk_create`` once
+``PROMPT_LOG_BATCH_SIZE`` entries are waiting or ``PROMPT_LOG_FLUSH_INTERVAL``
+seconds have passed. When the queue is full the entry is dropped
+(``PROMPT_LOG_OVERFLOW='drop'``) or the caller waits up to
+``PROMPT_LOG_BLOCK_TIMEOUT`` seconds for room (``'block'``) before dropping.
+
+With ``PROMPT_LOG_ASYNC=False`` every entry is saved immediately instead.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import PromptLog
+
+
+logger = logging.getLogger(__name__)
+
+class PromptLogWriter:
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _setting(self, name, default):
+        return getattr(settings, name, default)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self._setting('PROMPT_LOG_QUEUE_SIZE', 10000))
+            # Started lazily so pre-forking servers get one writer per worker
+            self._thread = threading.Thread(target=self._run, name='prompt-log-writer', daemon=True)
+            self._thread.start()
+
+    def log(self, metrics=None, **fields):
+        """Record one prompt log entry (see ``PromptLog`` for the fields).
+
+        ``metrics`` is the model call's ``CallMetrics``; reported token counts
+        replace the estimate in ``tokens_used``.
+        """
+        if metrics is not None:
+            fields.update(metrics.log_fields())
+            if metrics.prompt_tokens is not None and metrics.completion_tokens is not None:
+                fields['tokens_used'] = metrics.prompt_tokens + metrics.completion_tokens
+        entry = PromptLog(**fields)
+        if not self._setting('PROMPT_LOG_ASYNC', True):
+            entry.save()
+            self.written += 1
+            return
+        self._ensure_started()
+        try:
+            if self._setting('PROMPT_LOG_OVERFLOW', 'drop') == 'block':
+                self._queue.put(entry, timeout=self._setting('PROMPT_LOG_BLOCK_TIMEOUT', 1.0))
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, batch):
+        try:
+            PromptLog.objects.bulk_create(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Error writing %d prompt logs: %s", len(batch), e)
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        batch_size = self._setting('PROMPT_LOG_BATCH_SIZE', 50)
+        interval = self._setting('PROMPT_LOG_FLUSH_INTERVAL', 2.0)
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + interval
+            while True:
+                if isinstance(item, threading.Event):
+                    # flush() marker: everything queued before it is in the batch
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def flush(self, timeout=5.0):
+        """Block until every entry queued so far is written (or ``timeout`` passes)."""
+        if self._queue is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+prompt_log_writer = PromptLogWriter()
+atexit.register(prompt_log_writer.flush)
@@ -0,0 +1,119 @@
+"""
+Prompt assembly for guesses, without re-reading the conversation history.
+
+Each conversation's recent messages are kept as a rolling context in the
+Django cache (``PROMPT_CONTEXT_CACHE``, entries expire after
+``PROMPT_CONTEXT_TTL`` seconds and are evicted by the cache backend). An entry
+is stamped with the conversation's ``updated_at``; every recorded guess bumps
+that column, so a process holding an older entry notices on the row it has
+already loaded and rebuilds the context from the database once.
+
+History is trimmed newest-first to fit ``PROMPT_TOKEN_BUDGET`` tokens,
+including the fixed system prompt, instead of to a fixed number of messages.
+Token counts are estimates (about four characters per token), good enough for
+budgeting without calling the tokenizer endpoint.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from chatbot.gemini_interface import PROMPT_PREFIX, PROMPT_SUFFIX
+
+Prompt = namedtuple('Prompt', ['text', 'tokens', 'history_messages'])
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _format(sender, content):
+    if sender == 'user':
+        return f"[INST] {content} [/INST]\n"
+    return f"{content}\n\n"
+
+
+class PromptContext:
+    def __init__(self):
+        # The system prompt never changes, count it once
+        self.overhead_tokens = estimate_tokens(PROMPT_PREFIX) + estimate_tokens(PROMPT_SUFFIX)
+
+    def _setting(self, name, default):
+        return getattr(settings, name, default)
+
+    @property
+    def _cache(self):
+        return caches[self._setting('PROMPT_CONTEXT_CACHE', 'default')]
+
+    def _key(self, conversation_id):
+        return f"prompt-context:{conversation_id}"
+
+    def _store(self, conversation, entries):
+        limit = self._setting('PROMPT_CONTEXT_MAX_MESSAGES', 50)
+        self._cache.set(
+            self._key(conversation.id),
+            {"stamp": conversation.updated_at, "entries": entries[-limit:]},
+            self._setting('PROMPT_CONTEXT_TTL', 3600),
+        )
+
+    def _load(self, conversation):
+        limit = self._setting('PROMPT_CONTEXT_MAX_MESSAGES', 50)
+        rows = conversation.messages.order_by('-created_at').values_list('sender', 'content')[:limit]
+        entries = [(sender, content, estimate_tokens(_format(sender, content))) for sender, content in rows]
+        entries.reverse()
+        self._store(conversation, entries)
+        return entries
+
+    def entries(self, conversation):
+        """The cached ``(sender, content, tokens)`` history, oldest first."""
+        cached = self._cache.get(self._key(conversation.id))
+        if cached is not None and cached["stamp"] == conversation.updated_at:
+            return cached["entries"]
+        return self._load(conversation)
+
+    def start(self, conversation):
+        """Seed the context of a conversation that has no messages yet."""
+        self._store(conversation, [])
+
+    def build(self, conversation, user_prompt):
+        """Return the ``Prompt`` for ``user_prompt`` given the conversation so far.
+
+        Call it before saving the user's message, which is part of the prompt.
+        """
+        entries = self.entries(conversation)
+        budget = self._setting('PROMPT_TOKEN_BUDGET', 1024)
+        used = self.overhead_tokens + estimate_tokens(user_prompt)
+        parts = []
+        for sender, content, tokens in reversed(entries):
+            if used + tokens > budget:
+                break
+            parts.append(_format(sender, content))
+            used += tokens
+        parts.reverse()
+        parts.append(user_prompt)
+        return Prompt(''.join(parts), used, len(parts) - 1)
+
+    def record(self, conversation, previous_stamp, user_prompt, response_text):
+        """Append one guess exchange once ``conversation.updated_at`` has moved on.
+
+        ``previous_stamp`` is the ``updated_at`` the prompt was built against;
+        if the cached entry is from another point in time it is dropped instead.
+        """
+        cached = self._cache.get(self._key(conversation.id))
+        if cached is None:
+            return
+        if cached["stamp"] != previous_stamp:
+            # Someone else moved the conversation on; reload on the next build
+            self.forget(conversation.id)
+            return
+        entries = cached["entries"] + [
+            ('user', user_prompt, estimate_tokens(_format('user', user_prompt))),
+            ('bot', response_text, estimate_tokens(_format('bot', response_text))),
+        ]
+        self._store(conversation, entries)
+
+    def forget(self, conversation_id):
+        self._cache.delete(self._key(conversation_id))
+
+
+prompt_context = PromptContext()
@@ -1,3 +1,768 @@
-from django.test import TestCase
+import io
+import json
+import os
+import queue
+import tempfile
+import time
+import types
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import diskcache
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chatbot import backends, description_cache, gemini_interface, term_cache
+from chatbot.client import CircuitBreaker, CircuitOpen, DeadlineExceeded, GeminiClient, Overloaded
+
+from . import guess_cache, ingestion, views
+from .authentication import token_cache
+from .descriptions import schedule_description
+from .game import (
+    GUESSES_PER_ROUND, build_prompt, guess_cache_key, open_conversation, record_guess, record_timeout,
+)
+from .ingestion import PdfWriter
+from .models import Conversation, Message, PromptLog, TermExtractionJob, Topic, UserProfile, WordList
+from .word_pool import WordPool, word_pool
+from .matching import WordMatcher, is_near_match
+from .prompt_logs import PromptLogWriter
+from .prompts import prompt_context
+from .management.commands.bench_matcher import legacy_is_near_match
+
+
+class WordMatcherTests(SimpleTestCase):
+    cases = [
+        ("Julius Caesar", "Julius Caesar"),
+        ("Julius Caesar", "julius caesar!"),
+        ("Julius Caesar", "Caesar"),
+        ("Julius Caesar", "Julius Ceasar"),
+        ("Julius Caesar", "I think it's Julius Caesar"),
+        ("Julius Caesar", "Augustus"),
+        ("Julius Caesar", "I don't know"),
+        ("Julius Caesar", ""),
+        ("Python", "python 3"),
+        ("C++", "C"),
+        ("Ben Wallace", "Wallace Ben"),
+        ("Ben Wallace", "Ben Wallce"),
+        ("", "anything"),
+        ("!!", "??"),
+    ]
+
+    def test_matches_legacy_semantics(self):
+        for word, guess in self.cases:
+            with self.subTest(word=word, guess=guess):
+                self.assertEqual(WordMatcher(word).matches(guess), legacy_is_near_match(word, guess))
+                self.assertEqual(is_near_match(word, guess), legacy_is_near_match(word, guess))
+
+    def test_custom_threshold(self):
+        self.assertTrue(is_near_match("Julius Caesar", "Julius", ratio_threshold=0.5))
+        self.assertFalse(is_near_match("Julius Caesar", "Augustus", token_subset=False, ratio_threshold=0.9))
+
+
+class QueryPlanTests(TestCase):
+    """The hot queries must be served by the composite indexes in models.Meta."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', 'planner@example.com', 'password')
+        cls.conversation = Conversation.objects.create(user=cls.user, title="Plan", current_word="Rome")
+        Message.objects.create(conversation=cls.conversation, sender='user', content="clue")
+        PromptLog.objects.create(user=cls.user, topic="ancient_history", prompt="clue", response="guess")
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f"No plan assertions for {connection.vendor}")
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always be sequentially scanned
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_conversation_list(self):
+        qs = Conversation.objects.filter(user=self.user).order_by('-updated_at', '-id')[:20]
+        self.assertUsesIndex(qs, 'conv_user_updated_idx')
+
+    def test_recent_history(self):
+        qs = self.conversation.messages.order_by('-created_at')[:10]
+        self.assertUsesIndex(qs, 'msg_conv_created_idx')
+
+    def test_message_page(self):
+        qs = Message.objects.filter(conversation_id=self.conversation.id).order_by('created_at', 'id')[:100]
+        self.assertUsesIndex(qs, 'msg_conv_created_idx')
+
+    def test_prompt_log_history(self):
+        qs = PromptLog.objects.filter(user=self.user).order_by('-created_at')[:50]
+        self.assertUsesIndex(qs, 'promptlog_user_created_idx')
+        qs = PromptLog.objects.filter(topic="ancient_history").order_by('-created_at')[:50]
+        self.assertUsesIndex(qs, 'promptlog_topic_created_idx')
+
+
+class _LiveThread:
+    """Stands in for the writer thread so nothing drains the queue."""
+
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+@override_settings(PROMPT_LOG_ASYNC=True, PROMPT_LOG_BATCH_SIZE=3, PROMPT_LOG_FLUSH_INTERVAL=60)
+class PromptLogWriterTests(TransactionTestCase):
+    def test_entries_are_written_in_batches(self):
+        writer = PromptLogWriter()
+        batches = []
+        bulk_create = PromptLog.objects.bulk_create
+
+        def record(batch):
+            batches.append(len(batch))
+            return bulk_create(batch)
+
+        with mock.patch.object(PromptLog.objects, 'bulk_create', side_effect=record):
+            for i in range(7):
+                writer.log(prompt=f"clue {i}", response="guess")
+            # Two full batches go out on their own, the last one waits for flush()
+            writer.flush()
+        self.assertEqual(batches, [3, 3, 1])
+        self.assertEqual(PromptLog.objects.count(), 7)
+        self.assertEqual(writer.stats(), {"queued": 0, "written": 7, "dropped": 0, "failed": 0})
+
+    def test_full_queue_drops_or_blocks(self):
+        writer = PromptLogWriter()
+        writer._queue = queue.Queue(maxsize=2)
+        writer._thread = _LiveThread()
+        for i in range(3):
+            writer.log(prompt=f"clue {i}", response="guess")
+        self.assertEqual(writer.stats()["dropped"], 1)
+
+        writer._queue.get_nowait()
+        with self.settings(PROMPT_LOG_OVERFLOW='block', PROMPT_LOG_BLOCK_TIMEOUT=0.05):
+            writer.log(prompt="clue 3", response="guess")
+            started = time.monotonic()
+            writer.log(prompt="clue 4", response="guess")
+            self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(writer.stats()["dropped"], 2)
+
+        # Without a running writer thread, flush() writes what is queued itself
+        writer._thread.alive = False
+        writer.flush()
+        self.assertEqual(sorted(PromptLog.objects.values_list('prompt', flat=True)), ["clue 1", "clue 3"])
+        self.assertEqual(writer.stats(), {"queued": 0, "written": 2, "dropped": 2, "failed": 0})
+
+
+@override_settings(WORD_DESCRIPTION_ASYNC=True)
+class WordDescriptionTests(TransactionTestCase):
+    def setUp(self):
+        self.backend = backends.LocalBackend(latency=0, tokens_per_second=0)
+        previous = backends.set_backend(self.backend)
+        self.addCleanup(backends.set_backend, previous)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        saved = description_cache.disk.replace(diskcache.Cache(cache_dir.name, statistics=True))
+        self.addCleanup(description_cache.disk.replace, saved)
+        self.user = User.objects.create_user('describer', 'describer@example.com', 'password')
+        self.token = Token.objects.create(user=self.user)
+        self.conversation = self.played("Julius Caesar")
+
+    def played(self, word):
+        return Conversation.objects.create(
+            user=self.user, title="Game", current_word="Nero", described_word=word,
+            description_status='pending', description_requested_at=timezone.now(), description_topic='ancient_history',
+        )
+
+    def poll(self, conversation=None):
+        conversation = conversation or self.conversation
+        response = self.client.get(
+            f'/api/conversations/{conversation.id}/description/', HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        return response.json()
+
+    def test_generated_in_background_and_cached(self):
+        schedule_description(self.conversation.id, "Julius Caesar", 'ancient_history').result(timeout=5)
+        data = self.poll()
+        self.assertEqual((data['word'], data['status']), ("Julius Caesar", 'ready'))
+        self.assertIn("Julius Caesar", data['word_description'])
+        self.assertEqual(self.backend.calls, 1)
+
+        other = self.played("Julius Caesar")
+        schedule_description(other.id, "Julius Caesar", 'ancient_history').result(timeout=5)
+        self.assertEqual(self.poll(other)['word_description'], data['word_description'])
+        self.assertEqual(self.backend.calls, 1)
+        self.assertEqual(description_cache.stats()['hits'], 1)
+
+        # A description arriving after the next round ended is not stored
+        later = self.played("Nero")
+        schedule_description(later.id, "Julius Caesar", 'ancient_history').result(timeout=5)
+        self.assertEqual(self.poll(later)['status'], 'pending')
+
+    def test_lost_description_is_queued_again(self):
+        self.assertEqual(self.poll()['status'], 'pending')
+        self.assertEqual(self.backend.calls, 0)
+        # Queued by a process that has since gone away
+        Conversation.objects.filter(id=self.conversation.id).update(
+            description_requested_at=timezone.now() - timedelta(minutes=5)
+        )
+        with self.settings(WORD_DESCRIPTION_ASYNC=False):
+            data = self.poll()
+        self.assertEqual((data['status'], self.backend.calls), ('ready', 1))
+        self.assertIn("Julius Caesar", data['word_description'])
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager', 'pager@example.com', 'password')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.conversations = [
+            Conversation.objects.create(user=cls.user, title=f"Game {i}", current_word="Rome") for i in range(25)
+        ]
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Conversation.objects.create(user=other, title="Not mine", current_word="Rome")
+        cls.messages = [
+            Message.objects.create(conversation=cls.conversations[0], sender='user' if i % 2 else 'bot', content=f"m{i}")
+            for i in range(7)
+        ]
+
+    def get(self, url):
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_conversation_list_follows_cursor(self):
+        url, seen, pages = '/api/conversations/?limit=10', [], 0
+        while url:
+            page = self.get(url)
+            seen += [c['id'] for c in page['results']]
+            url, pages = page['next'], pages + 1
+        expected = Conversation.objects.filter(user=self.user).order_by('-updated_at', '-id')
+        self.assertEqual(seen, [c.id for c in expected])
+        self.assertEqual(pages, 3)
+
+    def test_message_pages(self):
+        url = f'/api/conversations/{self.conversations[0].id}/'
+        ids = [m.id for m in self.messages]
+
+        page = self.get(url + '?limit=3')
+        self.assertEqual(([m['id'] for m in page['messages']], page['has_more_messages']), (ids[4:], True))
+        page = self.get(url + f'?limit=3&before={ids[4]}')
+        self.assertEqual(([m['id'] for m in page['messages']], page['has_more_messages']), (ids[1:4], True))
+        page = self.get(url + f'?limit=3&before={ids[1]}')
+        self.assertEqual(([m['id'] for m in page['messages']], page['has_more_messages']), (ids[:1], False))
+
+        page = self.get(url + f'?limit=2&after={ids[2]}')
+        self.assertEqual(([m['id'] for m in page['messages']], page['has_more_messages']), (ids[3:5], True))
+        page = self.get(url + f'?after={ids[4]}')
+        self.assertEqual(([m['id'] for m in page['messages']], page['has_more_messages']), (ids[5:], False))
+        self.assertEqual(page['user_message_count'] + page['bot_message_count'], 7)
+
+
+@override_settings(PROMPT_LOG_ASYNC=False)
+class RecordGuessTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+        self.conversation = Conversation.objects.create(
+            user=self.user, title="Game", current_word="Julius Caesar", guesses_remaining=GUESSES_PER_ROUND
+        )
+
+    def guess(self, prompt, answer):
+        _, self.outcome = record_guess(self.conversation, self.user, 'ancient_history', prompt, answer, 0.0)
+        stored = Conversation.objects.get(id=self.conversation.id)
+        for field in ('score', 'num_rounds', 'current_word', 'guesses_remaining'):
+            self.assertEqual(getattr(stored, field), getattr(self.conversation, field), field)
+        return stored
+
+    def test_wrong_guess_uses_one_guess(self):
+        stored = self.guess("Roman general", "Augustus")
+        self.assertEqual(self.outcome, 'continue')
+        self.assertEqual(stored.guesses_remaining, GUESSES_PER_ROUND - 1)
+        self.assertEqual(stored.current_word, "Julius Caesar")
+        self.assertEqual(self.user.userprofile.rounds_played, 0)
+
+    def test_correct_guess_wins_round(self):
+        stored = self.guess("Roman general", "Julius Caesar")
+        self.assertEqual(self.outcome, 'won')
+        self.assertEqual((stored.score, stored.num_rounds, stored.guesses_remaining), (1, 4, GUESSES_PER_ROUND))
+        self.assertEqual((stored.described_word, stored.description_status), ("Julius Caesar", 'pending'))
+        self.user.userprofile.refresh_from_db()
+        self.assertEqual((self.user.userprofile.rounds_played, self.user.userprofile.rounds_won), (1, 1))
+
+    def test_last_wrong_guess_loses_round(self):
+        for _ in range(GUESSES_PER_ROUND):
+            stored = self.guess("Roman general", "Augustus")
+        self.assertEqual(self.outcome, 'lost')
+        self.assertEqual((stored.score, stored.num_rounds, stored.guesses_remaining), (0, 4, GUESSES_PER_ROUND))
+        self.user.userprofile.refresh_from_db()
+        self.assertEqual((self.user.userprofile.rounds_played, self.user.userprofile.rounds_won), (1, 0))
+
+    def test_prompt_is_logged(self):
+        self.guess("Roman general", "Augustus")
+        log = PromptLog.objects.get(user=self.user)
+        self.assertEqual((log.prompt, log.response, log.tokens_used), ("Roman general", "Augustus", 3))
+
+    def test_prompt_context_follows_guesses(self):
+        prompt_context.start(self.conversation)
+        for clue, answer in (("Roman general", "Augustus"), ("crossed the Rubicon", "Pompey")):
+            prompt = build_prompt(self.conversation, clue)
+            Message.objects.create(conversation=self.conversation, sender='user', content=clue)
+            self.guess(clue, answer)
+        with self.assertNumQueries(0):
+            prompt = build_prompt(self.conversation, "stabbed in the Senate")
+        self.assertEqual(prompt.text, (
+            "[INST] Roman general [/INST]\nAugustus\n\n"
+            "[INST] crossed the Rubicon [/INST]\nPompey\n\n"
+            "stabbed in the Senate"
+        ))
+        self.assertEqual(prompt.history_messages, 4)
+
+        # A stale process rebuilds from the database and trims to the budget
+        prompt_context.forget(self.conversation.id)
+        with self.settings(PROMPT_TOKEN_BUDGET=prompt_context.overhead_tokens + 10):
+            prompt = build_prompt(self.conversation, "stabbed in the Senate")
+        self.assertEqual(prompt.text, "Pompey\n\nstabbed in the Senate")
+        self.assertLessEqual(prompt.tokens, prompt_context.overhead_tokens + 10)
+
+    def test_edited_message_rewrites_the_context(self):
+        prompt_context.start(self.conversation)
+        for clue, answer in (("Roman general", "Augustus"), ("crossed the Rubicon", "Pompey")):
+            build_prompt(self.conversation, clue)
+            Message.objects.create(conversation=self.conversation, sender='user', content=clue)
+            self.guess(clue, answer)
+        first = Message.objects.filter(conversation=self.conversation, sender='user').earliest('id')
+        key = guess_cache_key(self.conversation, 'ancient_history', "stabbed in the Senate")
+
+        request = APIRequestFactory().put(f'/api/messages/{first.id}/', {"content": "won the Gallic wars"}, format='json')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(views.edit_message(request, first.id).status_code, 200)
+
+        self.conversation.refresh_from_db()
+        prompt = build_prompt(self.conversation, "stabbed in the Senate")
+        self.assertEqual(prompt.text, "[INST] won the Gallic wars [/INST]\nstabbed in the Senate")
+        self.assertNotEqual(guess_cache_key(self.conversation, 'ancient_history', "stabbed in the Senate"), key)
+
+    def test_guess_cache_key_covers_the_round_so_far(self):
+        conversation = open_conversation(self.user, None, "Roman general", 'ancient_history')
+        self.assertEqual(conversation.guesses_remaining, GUESSES_PER_ROUND)
+        opening = guess_cache_key(conversation, 'ancient_history', "crossed the Rubicon")
+        self.assertIsNotNone(opening)
+        record_guess(conversation, self.user, 'ancient_history', "Roman general", "I don't know", 0.0)
+        # The second clue of round one is keyed with the first exchange
+        self.assertNotEqual(guess_cache_key(conversation, 'ancient_history', "crossed the Rubicon"), opening)
+
+        conversation.guesses_remaining = GUESSES_PER_ROUND + 1
+        self.assertIsNone(guess_cache_key(conversation, 'ancient_history', "crossed the Rubicon"))
+
+    def test_timeout_ends_round_once(self):
+        self.assertEqual(record_timeout(self.conversation, self.user, 'ancient_history', "Julius Caesar"), 'timeout')
+        stored = Conversation.objects.get(id=self.conversation.id)
+        self.assertEqual((stored.score, stored.num_rounds, stored.described_word), (0, 4, "Julius Caesar"))
+        # A second, stale timeout for the same word changes nothing
+        self.assertEqual(record_timeout(self.conversation, self.user, 'ancient_history', "Julius Caesar"), 'continue')
+        self.assertEqual(Conversation.objects.get(id=self.conversation.id).num_rounds, 4)
+        self.assertFalse(Message.objects.filter(conversation=self.conversation).exists())
+
+
+class _FlakyModel:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def generate_content(self, contents, stream=False):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("upstream reset")
+        reply = types.SimpleNamespace(text="Julius Caesar")
+        return iter([reply]) if stream else reply
+
+
+class _HungModel:
+    """Answers only after ``delay`` seconds, before the reply or its first chunk."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def generate_content(self, contents, stream=False):
+        if not stream:
+            time.sleep(self.delay)
+            return types.SimpleNamespace(text="Julius Caesar")
+
+        def chunks():
+            time.sleep(self.delay)
+            yield types.SimpleNamespace(text="Julius Caesar")
+        return chunks()
+
+
+class GeminiClientTests(SimpleTestCase):
+    def make_client(self, model, **kwargs):
+        kwargs.setdefault('backoff_base', 0.001)
+        return GeminiClient(lambda: model, timeout=5, **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        model = _FlakyModel(failures=2)
+        self.assertEqual(self.make_client(model, max_retries=2).generate("clue").text, "Julius Caesar")
+        self.assertEqual(list(self.make_client(_FlakyModel(failures=1)).stream("clue")), ["Julius Caesar"])
+        self.assertEqual(model.calls, 3)
+
+    def test_breaker_opens_and_recovers(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+        model = _FlakyModel(failures=2)
+        client = self.make_client(model, max_retries=0, breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                client.generate("clue")
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertEqual(client.generate("clue").text, "Julius Caesar")
+        self.assertEqual(breaker.state, 'closed')
+
+        breaker.reset_timeout = 60
+        breaker.record_failure()
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpen):
+            client.generate("clue")
+        self.assertEqual(model.calls, 3)
+
+    def test_deadline_bounds_blocking_calls(self):
+        for call in (lambda c: c.generate("clue", timeout=0.1), lambda c: list(c.stream("clue", timeout=0.1))):
+            client = self.make_client(_HungModel(delay=1), max_retries=0, max_concurrency=1)
+            started = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                call(client)
+            self.assertLess(time.monotonic() - started, 0.5)
+            # The slot is free again even though the model has not answered yet
+            self.assertTrue(client._slots.acquire(blocking=False))
+            client._slots.release()
+
+        self.assertEqual(self.make_client(_HungModel(delay=0.05)).generate("clue", timeout=1).text, "Julius Caesar")
+
+    def test_unfinished_trial_is_handed_back(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        model = _FlakyModel(failures=0)
+        client = self.make_client(model, max_concurrency=1, breaker=breaker)
+
+        client._slots.acquire()
+        with self.assertRaises(Overloaded):
+            client.generate("clue", timeout=0.01)
+        client._slots.release()
+
+        stream = client.stream("clue")
+        self.assertEqual(next(stream), "Julius Caesar")
+        stream.close()
+        self.assertEqual(breaker.state, 'half-open')
+
+        self.assertEqual(client.generate("clue").text, "Julius Caesar")
+        self.assertEqual(breaker.state, 'closed')
+
+
+class LocalBackendTests(SimpleTestCase):
+    def setUp(self):
+        backend = backends.LocalBackend(latency=0, tokens_per_second=0, tokens_per_chunk=1)
+        previous = backends.set_backend(backend)
+        self.addCleanup(backends.set_backend, previous)
+
+    def test_answers_are_deterministic_and_stream(self):
+        guess = gemini_interface.get_gemini_response("famous Roman general")
+        self.assertIn(guess, backends.DEFAULT_LOCAL_WORDS)
+        self.assertEqual(gemini_interface.get_gemini_response("famous Roman general"), guess)
+        chunks = list(gemini_interface.get_gemini_response_stream("famous Roman general"))
+        self.assertEqual(''.join(chunks), guess)
+        self.assertEqual(len(chunks), len(guess.split()))
+
+    def test_pdf_terms(self):
+        terms = gemini_interface.extract_terms_from_pdf(b"%PDF-1.4", max_terms=5)
+        self.assertTrue(0 < len(terms) <= 5)
+        self.assertEqual(gemini_interface.extract_terms_from_pdf(b"%PDF-1.4", max_terms=5), terms)
+
+
+@override_settings(PROMPT_LOG_ASYNC=False, WORD_DESCRIPTION_ASYNC=False)
+class ChatStreamUsageTests(TestCase):
+    def setUp(self):
+        backend = backends.LocalBackend(latency=0, tokens_per_second=0, tokens_per_chunk=1)
+        previous = backends.set_backend(backend)
+        self.addCleanup(backends.set_backend, previous)
+        self.user = User.objects.create_user('streamer', 'streamer@example.com', 'password')
+        self.token = Token.objects.create(user=self.user)
+        self.backend = backend
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        saved = guess_cache.disk.replace(diskcache.Cache(cache_dir.name, statistics=True))
+        self.addCleanup(guess_cache.disk.replace, saved)
+
+    def guess(self, prompt, conversation_id=None):
+        response = self.client.post(
+            '/api/chat-stream/ancient_history/',
+            json.dumps({"conversation_id": conversation_id, "prompt": prompt}),
+            content_type='application/json', HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(event[len("data: "):]) for event in body.split("\n\n") if event]
+
+    def test_model_usage_is_logged(self):
+        events = self.guess("famous Roman general")
+        answer = ''.join(e['chunk'] for e in events)
+        log = PromptLog.objects.get(user=self.user)
+        self.assertEqual((log.topic, log.response, log.completion_tokens), ('ancient_history', answer, len(answer.split())))
+        self.assertGreater(log.prompt_tokens, len("famous Roman general".split()))
+        self.assertEqual(log.tokens_used, log.prompt_tokens + log.completion_tokens)
+        self.assertIsNotNone(log.first_chunk_time)
+        self.assertGreaterEqual(log.model_time, log.first_chunk_time)
+
+    async def test_async_stream(self):
+        response = await self.async_client.post(
+            '/api/chat-stream-async/ancient_history/',
+            json.dumps({"prompt": "ORAN: famous Roman general"}),
+            content_type='application/json', headers={"Authorization": f"Token {self.token.key}"},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = [json.loads(event[len("data: "):]) for event in body.split("\n\n") if event]
+        answer = ''.join(e['chunk'] for e in events)
+        self.assertTrue(answer)
+        self.assertEqual([e['done'] for e in events], [False] * (len(events) - 1) + [True])
+
+        state = events[-1]['state']
+        self.assertEqual((state['outcome'], state['score'], state['num_rounds']), ('won', 1, 4))
+        conversation = await Conversation.objects.aget(id=events[-1]['conversation_id'])
+        self.assertEqual((conversation.score, conversation.current_word), (1, state['current_word']))
+        messages = [(m.sender, m.content) async for m in conversation.messages.order_by('id')]
+        self.assertEqual(messages, [('user', "ORAN: famous Roman general"), ('bot', answer)])
+        self.assertEqual(state['message_ids'], [m.id async for m in conversation.messages.order_by('id')])
+        profile = await UserProfile.objects.aget(user=self.user)
+        self.assertEqual((profile.rounds_played, profile.rounds_won), (1, 1))
+
+    async def test_async_stream_rejects_malformed_bodies(self):
+        for body in ('[]', '"guess"', '{"prompt": 5}', '{"prompt": null}'):
+            response = await self.async_client.post(
+                '/api/chat-stream-async/ancient_history/', body,
+                content_type='application/json', headers={"Authorization": f"Token {self.token.key}"},
+            )
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_request_is_instrumented(self):
+        def scrape():
+            # Metrics are process-wide, so compare before and after
+            lines = self.client.get('/metrics').content.decode().splitlines()
+            return {k: float(v) for k, _, v in (line.rpartition(' ') for line in lines if not line.startswith('#'))}
+
+        before = scrape()
+        self.guess("famous Roman general")
+        after = scrape()
+
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        self.assertEqual(delta('http_requests_total{view="chat_stream",method="POST",status="200"}'), 1)
+        self.assertEqual(delta('http_time_to_first_byte_seconds_count{view="chat_stream"}'), 1)
+        self.assertEqual(delta('llm_calls_total{kind="stream",outcome="ok"}'), 1)
+        self.assertGreater(delta('http_request_db_queries_sum{view="chat_stream"}'), 0)
+
+    @override_settings(GUESS_CACHE_FUZZY=True)
+    def test_repeated_clue_is_replayed(self):
+        first = self.guess("famous Roman general")
+        state = first[-1]['state']
+        # Same word as the first guess was made against, at the start of a round
+        word = state['played_word'] or state['current_word']
+        other = Conversation.objects.create(user=self.user, title="Again", current_word=word)
+        prompt_context.start(other)
+        calls = self.backend.calls
+        again = self.guess("a Roman general, famous", str(other.id))
+        self.assertEqual(self.backend.calls, calls)
+        self.assertEqual([e['chunk'] for e in again[:-1]], [e['chunk'] for e in first[:-1]])
+        self.assertEqual(again[-1]['state']['message_ids'][-1], Message.objects.filter(conversation=other).latest('id').id)
+        log = PromptLog.objects.filter(user=self.user).latest('id')
+        self.assertEqual((log.cache_hit, log.tokens_used), (True, 0))
+        self.assertEqual(guess_cache.stats()['hits'], 1)
+
+        with override_settings(GUESS_CACHE_EXCLUDE_TOPICS=['ancient_history']):
+            self.guess("famous Roman general")
+        self.assertEqual(self.backend.calls, calls + 1)
+
+
+class _FailingChunkBackend(backends.LocalBackend):
+    """Fails every ``fail_every``-th PDF chunk with a non-retryable error."""
+
+    def __init__(self, fail_every, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_every = fail_every
+        self.pdf_calls = 0
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        if isinstance(contents, list):
+            self.pdf_calls += 1
+            if self.pdf_calls % self.fail_every == 0:
+                raise ValueError("model refused the chunk")
+        return super().generate_content(contents, stream=stream, **kwargs)
+
+
+@override_settings(PDF_INGEST_ASYNC=False, PDF_PAGES_PER_CHUNK=20, PDF_MAX_PAGES=100)
+class UploadTermsTests(TestCase):
+    def setUp(self):
+        if PdfWriter is None:
+            self.skipTest("pypdf is not installed")
+        backend = backends.LocalBackend(latency=0, tokens_per_second=0)
+        previous = backends.set_backend(backend)
+        self.addCleanup(backends.set_backend, previous)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        saved = term_cache.disk.replace(diskcache.Cache(cache_dir.name, statistics=True))
+        self.addCleanup(term_cache.disk.replace, saved)
+        self.backend = backend
+        # Uploaded lists vanish with the test transaction
+        self.addCleanup(word_pool.invalidate)
+
+    def pdf(self, pages):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=612, height=792)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return SimpleUploadedFile('notes.pdf', buffer.getvalue(), content_type='application/pdf')
+
+    def upload(self, pages, **data):
+        response = self.client.post('/api/upload-terms/', {"file": self.pdf(pages), **data})
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(response.json()['status_url']).json()
+
+    def test_chunks_are_merged_into_topic(self):
+        job = self.upload(45, topic_name="Roman Emperors", max_terms=8)
+        self.assertEqual((job['status'], job['pages'], job['chunks_total'], job['chunks_done']), ('done', 45, 3, 3))
+        self.assertTrue(0 < len(job['terms']) <= 8)
+        self.assertEqual(len({t.lower() for t in job['terms']}), len(job['terms']))
+        self.assertEqual(Topic.objects.get(topic_name="Roman Emperors").related_words, job['terms'])
+        self.assertEqual(list(word_pool.words('roman_emperors')), job['terms'])
+
+    def test_reupload_is_served_from_cache(self):
+        first = self.upload(5, topic_name="Rome", max_terms=8)
+        calls = self.backend.calls
+        again = self.upload(5, topic_name="Roman Republic", max_terms=8)
+        self.assertEqual((again['status'], again['cached'], again['terms']), ('done', True, first['terms']))
+        self.assertEqual(self.backend.calls, calls)
+        self.assertEqual(Topic.objects.get(topic_name="Roman Republic").related_words, first['terms'])
+        # A different max_terms is a different result
+        self.assertFalse(self.upload(5, max_terms=3)['cached'])
+        self.assertEqual(term_cache.stats()['hits'], 1)
+
+    def test_partial_results_are_not_cached(self):
+        backend = _FailingChunkBackend(fail_every=2, latency=0, tokens_per_second=0)
+        backends.set_backend(backend)
+        job = self.upload(45, max_terms=8)
+        self.assertEqual((job['status'], job['chunks_total'], job['chunks_failed']), ('done', 3, 1))
+        self.assertTrue(job['terms'])
+        self.assertFalse(self.upload(45, max_terms=8)['cached'])
+        self.assertEqual(backend.pdf_calls, 6)
+        self.assertEqual(term_cache.stats()['entries'], 0)
+
+        backend.fail_every = 1
+        job = self.upload(5)
+        self.assertEqual((job['status'], job['chunks_failed']), ('failed', 1))
+        self.assertIn("model refused the chunk", job['error'])
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_spooled_upload_is_moved(self):
+        with mock.patch('api.ingestion._move', wraps=ingestion._move) as move:
+            job = self.upload(5, max_terms=8)
+        self.assertEqual((job['status'], job['chunks_failed']), ('done', 0))
+        self.assertEqual(move.call_count, 1)
+        self.assertFalse(os.path.exists(move.call_args.args[0]))
+
+    @override_settings(PDF_UPLOAD_MAX_BYTES=1024)
+    def test_oversized_request_is_refused_unread(self):
+        with mock.patch('api.ingestion.spool_upload') as spool_upload:
+            response = self.client.post('/api/upload-terms/', {"file": self.pdf(1), "padding": "x" * 70000})
+        self.assertEqual(response.status_code, 413)
+        spool_upload.assert_not_called()
+        self.assertFalse(TermExtractionJob.objects.exists())
+
+    def test_page_limit(self):
+        job = self.upload(101)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn("101 pages", job['error'])
+        self.assertEqual(TermExtractionJob.objects.get().chunks_done, 0)
+
+
+class WordPoolTests(TestCase):
+    def setUp(self):
+        self.addCleanup(word_pool.invalidate)
+        word_pool.invalidate()
+
+    def test_builtin_topics_are_loaded(self):
+        names = word_pool.topic_names()
+        self.assertIn('ancient_history', names)
+        self.assertNotIn('famous_icons', names)
+        self.assertTrue(word_pool.words('famous_icons'))
+        word_pool.pick('ancient_history')
+        with self.assertNumQueries(0):
+            word, topic = word_pool.pick('ancient_history')
+            word_pool.topic_names()
+        self.assertIn(word, word_pool.words(topic))
+
+    def test_changes_are_picked_up(self):
+        self.assertEqual(word_pool.words('etruscans'), ())
+        WordList.objects.create(name='etruscans', words=["Tarquin", "Veii"])
+        self.assertEqual(word_pool.words('etruscans'), ("Tarquin", "Veii"))
+        self.assertIn('etruscans', word_pool.topic_names())
+        self.assertEqual(word_pool.pick('unknown_topic')[1], 'ancient_history')
+
+    def test_cache_outage_keeps_serving(self):
+        down = mock.Mock(**{f'{op}.side_effect': ConnectionError("cache down") for op in ('get', 'add', 'set', 'delete')})
+        user = User.objects.create_user(username="offline", password="pw")
+        auth = {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=user).key}"}
+        with mock.patch.object(WordPool, '_cache', new_callable=mock.PropertyMock, return_value=down):
+            for _ in range(2):
+                word_pool._checked_at = None  # due for a version check
+                word, topic = word_pool.pick('ancient_history')
+                self.assertIn(word, word_pool.words(topic))
+                word_pool.invalidate()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Topic.objects.create(user=user, topic_name="Etruscans")
+            response = self.client.get('/api/custom-topic-list/', **auth)
+            self.assertEqual((response.status_code, response.json()['topics']), (200, ["Etruscans"]))
+
+    def test_topic_lists_honour_etags(self):
+        user = User.objects.create_user(username="lister", password="pw")
+        auth = {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=user).key}"}
+        first = self.client.get('/api/all-topics-list/', **auth)
+        self.assertIn('ancient_history', first.json()['topics'])
+        again = self.client.get('/api/all-topics-list/', HTTP_IF_NONE_MATCH=first['ETag'], **auth)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+        mine = self.client.get('/api/custom-topic-list/', **auth)
+        self.assertEqual(mine.json()['topics'], [])
+        Topic.objects.create(user=user, topic_name="Etruscans")
+        changed = self.client.get('/api/custom-topic-list/', HTTP_IF_NONE_MATCH=mine['ETag'], **auth)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['topics'], ["Etruscans"])
+        self.assertNotEqual(changed['ETag'], mine['ETag'])
+
+        with self.assertNumQueries(0):
+            icon = self.client.get('/api/icons/random/', **auth).json()['icon']
+        self.assertIn(icon, word_pool.words('famous_icons'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'password')
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=self.user).key}"}
+
+    def test_token_is_resolved_once_until_logout(self):
+        self.client.get('/api/custom-topic-list/', **self.auth)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/custom-topic-list/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).json()['rounds_played'], 0)
+
+        self.assertEqual(self.client.post('/api/auth/logout/', **self.auth).status_code, 200)
+        self.assertEqual(self.client.get('/api/custom-topic-list/', **self.auth).status_code, 401)
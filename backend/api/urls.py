@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('auth/token/', obtain_auth_token, name='api_token_auth'),
@@ -9,13 +9,17 @@ urlpatterns = [
     path('auth/logout/', views.logout_view, name='logout'),
 
     path('chat-stream/<str:topic_name>/', views.chat_stream, name='chat_stream'),
+    path('chat-stream-async/<str:topic_name>/', async_views.chat_stream_async, name='chat_stream_async'),
     path('chat-demo/', views.chat_demo, name='chat_demo'),
     path('custom-topic-list/', views.custom_topic_list, name='topic_list'),
     path('all-topics-list/', views.all_topics_list, name='all_topics_list'),
     path('set-topic/', views.set_topic, name='set_topic'),
     path('upload-terms/', views.upload_terms, name='upload_terms'),
+    path('upload-terms/<uuid:job_id>/', views.term_job_status, name='term_job_status'),
     path('conversations/', views.conversation_list, name='conversation_list'),
     path('conversations/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
+    path('conversations/<int:conversation_id>/description/', views.word_description, name='word_description'),
+    path('conversations/<int:conversation_id>/timeout/', views.round_timeout, name='round_timeout'),
     path('conversations/<int:conversation_id>/reset-round/', views.reset_round, name='reset_round'),
     path('topics/<str:topic_name>/random-subject/', views.random_avatar_subject, name='random_avatar_subject'),
     path('icons/random/', views.random_famous_icon, name='random_famous_icon'),
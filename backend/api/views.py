@@ -3,27 +3,48 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.http import StreamingHttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
 from rest_framework.response import Response
 from rest_framework import serializers
+from rest_framework.pagination import CursorPagination
 from django.contrib.auth.models import User
 from django.contrib.auth import logout
 from rest_framework.authtoken.models import Token
 import json
+import logging
 import time
 from django.db import transaction
+from django.db.models import Count, Q
 import random
-import os
-import re
-import difflib
 
-from .models import Conversation, Message, PromptLog, UserProfile, Topic
+from .models import Conversation, Message, UserProfile, Topic, TermExtractionJob
+from . import guess_cache
+from .authentication import token_cache
+from .descriptions import retry_if_stale
+from .ingestion import UploadRejected, check_upload_size, job_status, start_job
+from .word_pool import user_topic_names, word_pool
+from .prompt_logs import prompt_log_writer
+from .prompts import prompt_context
+from .game import (
+    DEFAULT_TOPIC,
+    GUESSES_PER_ROUND,
+    TIMEOUT_SENTINEL,
+    build_prompt,
+    guess_cache_key,
+    open_conversation,
+    record_guess,
+    record_timeout,
+    state_delta,
+)
 from chatbot.gemini_interface import (
+    CallMetrics,
     get_gemini_response,
     get_gemini_response_stream,
-    extract_terms_from_pdf,
-    get_word_description,
 )
 
+logger = logging.getLogger(__name__)
+
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
@@ -32,7 +53,7 @@ class MessageSerializer(serializers.ModelSerializer):
 class ConversationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Conversation
-        fields = ['id', 'title', 'created_at', 'updated_at', 'score', 'current_word', 'word_description', 'guesses_remaining', 'num_rounds']
+        fields = ['id', 'title', 'created_at', 'updated_at', 'score', 'current_word', 'word_description', 'described_word', 'description_status', 'guesses_remaining', 'num_rounds']
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -45,78 +66,53 @@ class UserProfileSerializer(serializers.ModelSerializer):
 def chat_stream(request, topic_name):
     """Full chatbot with history - requires authentication"""
     try:
-        conversation_id = request.data.get('conversation_id')
-        if conversation_id and conversation_id != "null" and conversation_id.strip():
-            try:
-                conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
-                print(f"Retrieved existing conversation: {conversation.id}")
-            except Exception as e:
-                print(f"Error retrieving conversation {conversation_id}: {str(e)}")
-                conversation_id = None
-        if not conversation_id or conversation_id == "null" or not conversation_id.strip():
-            title_preview = ' '.join(request.data.get('prompt', '').split()[:5])
-            if len(title_preview) > 0:
-                title = f"Chat about {title_preview}..."
-            else:
-                topic = "ANCIENT HISTORY"
-
-                title = f"TOPIC: {topic}"
-            
-            # Use the topic_name from URL parameter or default
-            if not topic_name:
-                topic_name = "ancient_history"
-            
-            print(f"Using topic: {topic_name}")
-                
-            try:
-                conversation = Conversation.objects.create(
-                    user=request.user,
-                    title=title,
-
-                    current_word=get_word(topic_name),
+        user_prompt = request.data.get('prompt', '')
+        try:
+            conversation = open_conversation(
+                request.user, request.data.get('conversation_id'), user_prompt, topic_name
+            )
+        except Exception as e:
+            logger.exception("Error creating conversation: %s", e)
+            return Response({"error": f"Could not create conversation: {str(e)}"}, status=500)
 
-                )
-                print(f"Created conversation {conversation.id} for user {request.user.username}")
-            except Exception as e:
-                print(f"Error creating conversation: {str(e)}")
-                return Response({"error": f"Could not create conversation: {str(e)}"}, status=500)
+        if TIMEOUT_SENTINEL in user_prompt:
+            # Legacy timeout signal: advance the round without calling the model
+            outcome = record_timeout(conversation, request.user, topic_name)
+            data = json.dumps({
+                "chunk": "",
+                "done": True,
+                "conversation_id": str(conversation.id),
+                "state": state_delta(conversation, outcome)
+            })
+            return StreamingHttpResponse(iter([f"data: {data}\n\n"]), content_type='text/event-stream')
 
-        user_prompt = request.data.get('prompt', '')
+        prompt = build_prompt(conversation, user_prompt)
+        cache_key = guess_cache_key(conversation, topic_name, user_prompt)
+        cached_reply = guess_cache.lookup(cache_key)
         try:
-            Message.objects.create(
+            user_message = Message.objects.create(
                 conversation=conversation,
                 sender='user',
                 content=user_prompt
             )
         except Exception as e:
-            print(f"Error creating message: {str(e)}")
+            logger.exception("Error creating message: %s", e)
             return Response({"error": f"Could not save message: {str(e)}"}, status=500)
 
-        def format_conversation_for_llama(messages):
-            formatted_context = ""
-            
-            for msg in messages:
-                if msg.sender == "user":
-                    formatted_context += f"[INST] {msg.content} [/INST]\n"
-                else:
-                    formatted_context += f"{msg.content}\n\n"
-            return formatted_context
-
-        history = list(conversation.messages.order_by('-created_at')[:10])
-        history.reverse()
-        context = format_conversation_for_llama(history)
-        full_prompt = context + user_prompt
-
         start_time = time.time()
+        metrics = CallMetrics()
 
         class ResponseHolder:
             def __init__(self):
                 self.text = ""
+                self.chunks = []
                 self.is_complete = False
                 self.bot_message = None
+                self.state = None
             
             def add_text(self, text):
                 self.text += text
+                self.chunks.append(text)
             
             def mark_complete(self):
                 self.is_complete = True
@@ -125,95 +121,23 @@ def chat_stream(request, topic_name):
                 if not self.is_complete:
                     return
                 try:
-                    self.bot_message = Message.objects.create(
-                        conversation=conversation,
-                        sender='bot',
-                        content=self.text
-                    )
-                    print(f"Saved bot message with ID: {self.bot_message.id}, length: {len(self.text)}")
-
-                    def _normalize(s):
-                        return re.sub(r'[^a-z0-9\s]', '', (s or "").lower()).strip()
-                    
-                    def is_near_match(text, target, token_subset=True, ratio_threshold=0.7):
-                        if not target:
-                            return False
-                        text_n = _normalize(text)
-                        target_n = _normalize(target)
-
-                        if target_n and target_n in text_n:
-                            return True
-
-                        if token_subset:
-                            t_tokens = [t for t in target_n.split() if t]
-                            txt_tokens = [t for t in text_n.split() if t]
-                            if t_tokens and set(t_tokens).issubset(set(txt_tokens)):
-                                return True
-
-                        if difflib.SequenceMatcher(None, target_n, text_n).ratio() >= ratio_threshold:
-                            return True
-
-                        tlen = len(target_n.split())
-                        txt_tokens = text_n.split()
-                        if tlen > 0 and len(txt_tokens) >= 1:
-
-                            for w in range(max(1, tlen), min(len(txt_tokens), tlen + 3) + 1):
-                                for i in range(0, len(txt_tokens) - w + 1):
-                                    window = " ".join(txt_tokens[i:i+w])
-                                    if difflib.SequenceMatcher(None, target_n, window).ratio() >= ratio_threshold:
-                                        return True
-                        return False
-                    
-                    if "__TIMEOUT__" in user_prompt:
-                        # Timer ran out - generate description of the missed word
-                        old_word = conversation.current_word
-                        conversation.word_description = get_word_description(old_word, topic_name)
-                        conversation.num_rounds -= 1
-                        conversation.current_word = get_word(topic_name)
-                        conversation.guesses_remaining = 3
-                        request.user.userprofile.rounds_played += 1
-                        request.user.userprofile.save()
-                    else:
-                        conversation.guesses_remaining -= 1
-                        
-                        # Check if AI guessed the word OR if user used the backdoor "ORAN"
-                        if (is_near_match(conversation.current_word,self.text) or "ORAN" in user_prompt):
-                            # AI guessed correctly - generate description of the guessed word
-                            old_word = conversation.current_word
-                            conversation.word_description = get_word_description(old_word, topic_name)
-                            conversation.score += 1
-                            conversation.num_rounds -= 1
-                            conversation.current_word = get_word(topic_name)
-                            conversation.guesses_remaining = 3
-                            request.user.userprofile.rounds_won += 1
-                            request.user.userprofile.rounds_played += 1
-                            request.user.userprofile.save()
-                        elif (conversation.guesses_remaining == 0):
-                            # Out of guesses - generate description of the missed word
-                            old_word = conversation.current_word
-                            conversation.word_description = get_word_description(old_word, topic_name)
-                            conversation.num_rounds -= 1
-                            conversation.current_word = get_word(topic_name)
-                            conversation.guesses_remaining = 3
-                            request.user.userprofile.rounds_played += 1
-                            request.user.userprofile.save()
-                    
-                    conversation.save()
-                    processing_time = time.time() - start_time
-                    PromptLog.objects.create(
-                        user=request.user,
-                        prompt=user_prompt,
-                        response=self.text,
-                        processing_time=processing_time,
-                        tokens_used=len(user_prompt.split()) + len(self.text.split())
+                    self.bot_message, outcome = record_guess(
+                        conversation, request.user, topic_name, user_prompt, self.text, start_time,
+                        prompt_tokens=prompt.tokens, metrics=metrics,
+                        cache_hit=cached_reply is not None
                     )
+                    self.state = state_delta(conversation, outcome, user_message, self.bot_message)
                 except Exception as e:
-                    print(f"Error saving bot message: {str(e)}")
+                    logger.exception("Error saving bot message: %s", e)
         
         response_holder = ResponseHolder()
         
         def event_stream():
-            for chunk in get_gemini_response_stream(full_prompt):
+            if cached_reply is not None:
+                chunks = iter(cached_reply)
+            else:
+                chunks = get_gemini_response_stream(prompt.text, metrics=metrics)
+            for chunk in chunks:
                 response_holder.add_text(chunk)
                 data = json.dumps({
                     "chunk": chunk, 
@@ -222,18 +146,21 @@ def chat_stream(request, topic_name):
                 })
                 yield f"data: {data}\n\n"
             response_holder.mark_complete()
+            if cached_reply is None:
+                guess_cache.store(cache_key, response_holder.chunks)
             response_holder.save_message()
             data = json.dumps({
                 "chunk": "", 
                 "done": True,
-                "conversation_id": str(conversation.id)
+                "conversation_id": str(conversation.id),
+                "state": response_holder.state
             })
             yield f"data: {data}\n\n"
         response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
         return response
 
     except Exception as e:
-        print(f"Unexpected error in chat_stream: {str(e)}")
+        logger.exception("Unexpected error in chat_stream: %s", e)
         return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=500)
 
 @api_view(['POST'])
@@ -251,26 +178,18 @@ def chat_demo(request):
             title=f"Demo: {title_preview}",
             is_demo=True
         )
-        PromptLog.objects.create(
+        start_time = time.time()
+        metrics = CallMetrics()
+        response_text = get_gemini_response(user_prompt, metrics=metrics)
+        processing_time = time.time() - start_time
+        prompt_log_writer.log(
+            metrics=metrics,
             user=request.user if request.user.is_authenticated else None,
             prompt=user_prompt,
-            response="[Demo response]",
-            tokens_used=len(user_prompt.split()),
-            processing_time=0.0
+            response=response_text,
+            processing_time=processing_time,
+            tokens_used=len(user_prompt.split()) + len(response_text.split())
         )
-        start_time = time.time()
-        response_text = get_gemini_response(user_prompt)
-        processing_time = time.time() - start_time
-        prompt_log = PromptLog.objects.filter(
-            prompt=user_prompt, 
-            user=request.user if request.user.is_authenticated else None
-        ).order_by('-created_at').first()
-
-        if prompt_log:
-            prompt_log.response = response_text
-            prompt_log.processing_time = processing_time
-            prompt_log.tokens_used = len(user_prompt.split()) + len(response_text.split())
-            prompt_log.save()
         
         return Response({
             "response": response_text,
@@ -284,34 +203,116 @@ def chat_demo(request):
             status=500
         )
 
+class ConversationCursorPagination(CursorPagination):
+    ordering = ('-updated_at', '-id')
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+MESSAGE_PAGE_SIZE = 100
+MAX_MESSAGE_PAGE_SIZE = 500
+
+def _int_param(request, name, default=None, maximum=None):
+    try:
+        value = int(request.query_params.get(name))
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, 1), maximum) if maximum else value
+
+def _conditional_response(request, etag, get_data):
+    """Answer 304 if the client already has ``etag``, otherwise ``get_data()`` tagged with it."""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(get_data())
+    response['ETag'] = etag
+    # Per user, and clients should revalidate rather than reuse blindly
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def conversation_list(request):
-    conversations = Conversation.objects.filter(user=request.user).order_by('-updated_at')
-    serializer = ConversationSerializer(conversations, many=True)
-    return Response(serializer.data)
+    """Conversations, most recently updated first, paginated with ?cursor=&limit="""
+    conversations = Conversation.objects.filter(user=request.user)
+    paginator = ConversationCursorPagination()
+    page = paginator.paginate_queryset(conversations, request)
+    serializer = ConversationSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def conversation_detail(request, conversation_id):
+    """Conversation plus its latest messages.
+
+    ``?limit=`` bounds the page (newest messages, in chronological order),
+    ``?before=<message id>`` pages back through older messages and
+    ``?after=<message id>`` returns only messages newer than the client has.
+    """
     try:
-        conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
+        conversation = get_object_or_404(
+            Conversation.objects.annotate(
+                user_message_count=Count('messages', filter=Q(messages__sender='user')),
+                bot_message_count=Count('messages', filter=Q(messages__sender='bot')),
+            ),
+            id=conversation_id,
+            user=request.user,
+        )
         conversation_data = ConversationSerializer(conversation).data
-        messages = conversation.messages.all().order_by('created_at')
-        messages_data = MessageSerializer(messages, many=True).data
-        user_msgs = sum(1 for m in messages if m.sender == 'user')
-        bot_msgs = sum(1 for m in messages if m.sender == 'bot')
-        print(f"Returning {len(messages_data)} messages for conversation {conversation_id}")
-        print(f"User messages: {user_msgs}, Bot messages: {bot_msgs}")
+
+        limit = _int_param(request, 'limit', MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE)
+        after = _int_param(request, 'after')
+        before = _int_param(request, 'before')
+        messages = Message.objects.filter(conversation_id=conversation.id)
+        if after is not None:
+            page = list(messages.filter(id__gt=after).order_by('created_at', 'id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before is not None:
+                messages = messages.filter(id__lt=before)
+            page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+            page.reverse()
+
+        messages_data = MessageSerializer(page, many=True).data
+        logger.debug("Returning %d messages for conversation %s", len(messages_data), conversation_id)
+        logger.debug("User messages: %d, Bot messages: %d", conversation.user_message_count, conversation.bot_message_count)
         result = {
             **conversation_data,
-            "messages": messages_data
+            "user_message_count": conversation.user_message_count,
+            "bot_message_count": conversation.bot_message_count,
+            "messages": messages_data,
+            # More messages exist beyond this page: older ones (use ?before=)
+            # or, with ?after=, newer ones (use ?after= with the last id)
+            "has_more_messages": has_more,
         }
         return Response(result)
     except Exception as e:
-        print(f"Error in conversation_detail: {str(e)}")
+        logger.exception("Error in conversation_detail: %s", e)
         return Response({"error": str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def word_description(request, conversation_id):
+    """Poll the description of the last played word (generated in the background)"""
+    rows = Conversation.objects.filter(id=conversation_id, user=request.user).values(
+        'described_word', 'word_description', 'description_status', 'description_requested_at', 'description_topic'
+    )
+    row = rows.first()
+    if row is None:
+        return Response({"error": "Conversation not found"}, status=404)
+    if row['description_status'] == 'pending' and retry_if_stale(
+        conversation_id, row['described_word'], row['description_topic'], row['description_requested_at']
+    ):
+        row = rows.first()
+    return Response({
+        "word": row['described_word'],
+        "word_description": row['word_description'],
+        "status": row['description_status'],
+    })
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -352,7 +353,7 @@ def register_user(request):
     
     except Exception as e:
         # Log the error for debugging
-        print(f"Registration error: {str(e)}")
+        logger.exception("Registration error: %s", e)
         return Response({'error': 'An unexpected error occurred during registration'}, status=500)
 
 @api_view(['GET'])
@@ -370,7 +371,9 @@ def user_info(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
-    request.user.auth_token.delete()
+    token = request.auth if isinstance(request.auth, Token) else request.user.auth_token
+    token_cache.invalidate(token.key)
+    token.delete()
     logout(request)
     return Response({"success": "Successfully logged out"})
 
@@ -381,13 +384,18 @@ def edit_message(request, message_id):
         message = get_object_or_404(Message, id=message_id, sender='user')
         if message.conversation.user != request.user:
             return Response({"error": "Not authorized to edit this message"}, status=403)
-        message.content = request.data.get('content', '')
-        message.save()
-        message_time = message.created_at
-        Message.objects.filter(
-            conversation=message.conversation,
-            created_at__gt=message_time
-        ).delete()
+        with transaction.atomic():
+            message.content = request.data.get('content', '')
+            message.save()
+            message_time = message.created_at
+            Message.objects.filter(
+                conversation=message.conversation,
+                created_at__gt=message_time
+            ).delete()
+            # Moves the stamp of every node's cached prompt context on
+            Conversation.objects.filter(id=message.conversation_id).update(updated_at=timezone.now())
+        # The history changed under the cached context (and the guess cache keys built from it)
+        prompt_context.forget(message.conversation_id)
         return Response({
             "id": message.id,
             "content": message.content,
@@ -404,8 +412,8 @@ def reset_round(request, conversation_id):
     """Reset guesses_remaining for a new round"""
     try:
         conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
-        conversation.guesses_remaining = 3
-        conversation.save()
+        conversation.guesses_remaining = GUESSES_PER_ROUND
+        conversation.save(update_fields=['guesses_remaining', 'updated_at'])
         
         return Response({
             "success": True,
@@ -415,51 +423,28 @@ def reset_round(request, conversation_id):
     except Exception as e:
         return Response({"error": f"Error resetting round: {str(e)}"}, status=500)
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def custom_topic_list(request):
-    names = list(Topic.objects.filter(user=request.user).order_by('topic_name').values_list('topic_name', flat=True))
-    return Response({"topics": names})
+def round_timeout(request, conversation_id):
+    """End the current round because the timer ran out - no model call.
 
-def get_word(topic):
-    base_dir = os.path.join(os.path.dirname(__file__), 'topics')
-    custom_dir = os.path.join(os.path.dirname(__file__), 'custom_topics')
-    filepath = os.path.join(base_dir, f"{topic}.txt")
-    
-    # Check if the topic file exists in topics folder
-    if not os.path.exists(filepath):
-        # Try custom_topics folder
-        custom_filepath = os.path.join(custom_dir, f"{topic}.txt")
-        if os.path.exists(custom_filepath):
-            filepath = custom_filepath
-            print(f"Using custom topic file: {topic}.txt")
-        else:
-            print(f"Topic file '{topic}.txt' not found in topics or custom_topics, defaulting to ancient_history")
-            topic = "ancient_history"
-            filepath = os.path.join(base_dir, f"{topic}.txt")
-    
+    Body: ``topic_name`` (for the next word) and optionally ``current_word``,
+    the word the client timed out on; if the round already moved on, nothing
+    changes. Returns the same state object as the final chat-stream event.
+    """
     try:
-        with open(filepath, "r") as f:
-            words = [line.strip() for line in f if line.strip()]  # Filter out empty lines
-        
-        if not words:
-            print(f"Topic file '{topic}.txt' is empty, defaulting to ancient_history")
-            filepath = os.path.join(base_dir, "ancient_history.txt")
-            with open(filepath, "r") as f:
-                words = [line.strip() for line in f if line.strip()]
-        
-        word = random.choice(words)
-        print(f"Selected word: {word} from topic: {topic}")
-        return word
+        conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
+        topic_name = request.data.get('topic_name') or DEFAULT_TOPIC
+        outcome = record_timeout(conversation, request.user, topic_name, request.data.get('current_word'))
+        return Response(state_delta(conversation, outcome))
     except Exception as e:
-        print(f"Error reading topic file: {str(e)}, defaulting to ancient_history")
-        filepath = os.path.join(base_dir, "ancient_history.txt")
-        with open(filepath, "r") as f:
-            words = [line.strip() for line in f if line.strip()]
-        word = random.choice(words)
-        print(f"Selected word: {word} from default topic: ancient_history")
-        return word
+        return Response({"error": f"Error ending round: {str(e)}"}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def custom_topic_list(request):
+    names, etag = user_topic_names(request.user.id)
+    return _conditional_response(request, etag, lambda: {"topics": list(names)})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -479,7 +464,7 @@ def user_details(request):
         
         return Response(result)
     except Exception as e:
-        print(f"Error in conversation_detail: {str(e)}")
+        logger.exception("Error in user_details: %s", e)
         return Response({"error": str(e)}, status=500)
 
 # @api_view(['PUT'])
@@ -490,16 +475,23 @@ def user_details(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
-    profile = request.user.userprofile
+    # Not request.user.userprofile: the copy cached with the token lags behind the counters
+    profile = get_object_or_404(UserProfile, user=request.user)
     serializer = UserProfileSerializer(profile)
-    print(f"User profile data: {serializer.data}")
+    logger.debug("User profile data: %s", serializer.data)
     return Response(serializer.data)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def upload_terms(request):
+    """Queue term extraction for an uploaded PDF and return the job to poll."""
     try:
+        try:
+            # Before request.FILES, which reads the whole body
+            check_upload_size(request.META.get('CONTENT_LENGTH'))
+        except UploadRejected as e:
+            return Response({"error": str(e)}, status=413)
         upload = request.FILES.get('file')
         topic_name = request.POST.get('topic_name') or request.query_params.get('topic_name')
         if not upload:
@@ -514,70 +506,41 @@ def upload_terms(request):
         except ValueError:
             max_terms = 50
 
-        pdf_bytes = upload.read()
-        terms = extract_terms_from_pdf(pdf_bytes, max_terms=max_terms)
-        
-        # Log the number of terms extracted
-        print(f"Extracted {len(terms)} terms from PDF")
-        
-        # Check if we got any terms
-        if not terms:
-            return Response({"error": "No terms could be extracted from the PDF. Please ensure the PDF contains readable text."}, status=400)
-        
-        if topic_name:
-            topic_name = topic_name.strip()
-            # Use authenticated user if available, else leave user null
-            user = request.user if request.user.is_authenticated else None
-            topic, created = Topic.objects.get_or_create(
-                user=user,
-                topic_name=topic_name,
-                defaults={'related_words': terms}
-            )
-            if not created:
-                # Update related_words if topic already exists
-                topic.related_words = terms
-                topic.save()
-            
-            # Save terms to a txt file in custom_topics folder
-            custom_topics_dir = os.path.join(os.path.dirname(__file__), 'custom_topics')
-            # Create directory if it doesn't exist
-            os.makedirs(custom_topics_dir, exist_ok=True)
-            
-            # Create filename (use topic_name with underscores, lowercase)
-            safe_filename = topic_name.lower().replace(' ', '_')
-            filepath = os.path.join(custom_topics_dir, f"{safe_filename}.txt")
-            
-            # Write terms to file (one per line)
-            with open(filepath, 'w') as f:
-                for term in terms:
-                    f.write(f"{term}\n")
-            
-            print(f"Saved {len(terms)} terms to {filepath}")
-
-        all_topics = Topic.objects.all().order_by('topic_name').values_list('topic_name', flat=True)
-        print("All topic names:", list(all_topics))
+        # Use authenticated user if available, else leave user null
+        user = request.user if request.user.is_authenticated else None
+        try:
+            job = start_job(user, upload, topic_name, max_terms)
+        except UploadRejected as e:
+            return Response({"error": str(e)}, status=413)
 
-        return Response({"terms": terms, "topic_name": topic_name})
+        data = job_status(job)
+        data["status_url"] = reverse('term_job_status', args=[job.id])
+        return Response(data, status=202)
     except Exception as e:
-        print(f"upload_terms error: {e}")
+        logger.exception("upload_terms error: %s", e)
         return Response({"error": "Failed to extract terms"}, status=500)
 
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def term_job_status(request, job_id):
+    """Progress of a PDF term extraction job; ``terms`` is set once it is done."""
+    job = get_object_or_404(TermExtractionJob, id=job_id)
+    if job.user_id is not None and job.user_id != request.user.id:
+        return Response({"error": "Job not found"}, status=404)
+    return Response(job_status(job))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def random_avatar_subject(request, topic_name: str):
-    """Return a random subject string from backend/api/topics/<topic_name>.txt.
+    """Return a random subject from the word list of <topic_name>.
     This is used by the frontend to seed a deterministic pixel avatar.
     """
     try:
         safe_name = str(topic_name).strip().lower()
-        base_dir = os.path.join(os.path.dirname(__file__), 'topics')
-        filepath = os.path.join(base_dir, f"{safe_name}.txt")
-        if not os.path.isfile(filepath):
-            return Response({"error": f"Topic file not found: {safe_name}.txt"}, status=404)
-        with open(filepath, 'r') as f:
-            items = [line.strip() for line in f if line.strip()]
+        items = word_pool.words(safe_name)
         if not items:
-            return Response({"error": "No subjects in topic file"}, status=400)
+            return Response({"error": f"Topic not found: {safe_name}"}, status=404)
         subject = random.choice(items)
         return Response({"subject": subject})
     except Exception as e:
@@ -586,18 +549,13 @@ def random_avatar_subject(request, topic_name: str):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def random_famous_icon(request):
-    """Return a random famous icon name from topics/famous_icons.txt.
+    """Return a random famous icon name from the famous_icons word list.
     Used by the frontend to pick a consistent AI persona across categories.
     """
     try:
-        base_dir = os.path.join(os.path.dirname(__file__), 'topics')
-        filepath = os.path.join(base_dir, 'famous_icons.txt')
-        if not os.path.isfile(filepath):
-            return Response({"error": "famous_icons.txt not found"}, status=404)
-        with open(filepath, 'r') as f:
-            items = [line.strip() for line in f if line.strip()]
+        items = word_pool.words('famous_icons')
         if not items:
-            return Response({"error": "No icons listed"}, status=400)
+            return Response({"error": "No icons listed"}, status=404)
         icon = random.choice(items)
         return Response({"icon": icon})
     except Exception as e:
@@ -619,33 +577,10 @@ def set_topic(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def all_topics_list(request):
-    """Get all available topics from both topics/ and custom_topics/ folders"""
+    """Get all available topics, built in and uploaded"""
     try:
-        topics = []
-        
-        # Get topics from topics folder
-        topics_dir = os.path.join(os.path.dirname(__file__), 'topics')
-        if os.path.exists(topics_dir):
-            for filename in os.listdir(topics_dir):
-                if filename.endswith('.txt') and filename != 'famous_icons.txt':
-                    # Remove .txt extension and format name
-                    topic_name = filename[:-4]
-                    topics.append(topic_name)
-        
-        # Get topics from custom_topics folder
-        custom_dir = os.path.join(os.path.dirname(__file__), 'custom_topics')
-        if os.path.exists(custom_dir):
-            for filename in os.listdir(custom_dir):
-                if filename.endswith('.txt'):
-                    # Remove .txt extension
-                    topic_name = filename[:-4]
-                    topics.append(topic_name)
-        
-        # Remove duplicates and sort
-        topics = sorted(list(set(topics)))
-        
-        print(f"Found {len(topics)} total topics")
-        return Response({"topics": topics})
+        topics = word_pool.topic_names()
+        return _conditional_response(request, word_pool.topics_etag(), lambda: {"topics": list(topics)})
     except Exception as e:
-        print(f"Error getting all topics: {str(e)}")
+        logger.exception("Error getting all topics: %s", e)
         return Response({"error": f"Failed to get topics: {str(e)}"}, status=500)
\ No newline at end of file
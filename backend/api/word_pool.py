@@ -0,0 +1,238 @@
+"""
+Process-wide, in-memory index of the topic word lists.
+
+The lists live in the ``WordList`` table: the shipped ``topics/*.txt`` files are
+imported by migration ``0008`` (and ``manage.py load_topics``), uploads are
+saved there by ``ingestion.save_topic_terms``. Each node reads all lists from the
+database in one query and keeps them as immutable tuples, so picking a word
+is a ``random.choice`` over memory and listing topics costs no query either.
+Unknown topic names never reach the database.
+
+Nodes share no state but the Django cache: every change to a ``WordList``
+bumps a version number there, and each node compares it with its own at most
+every ``WORD_POOL_RECHECK_SECONDS`` seconds, dropping its lists when it moved.
+The node that made the change drops them right away.
+"""
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Topic, WordList
+
+logger = logging.getLogger(__name__)
+
+TOPICS_DIR = os.path.join(os.path.dirname(__file__), 'topics')
+DEFAULT_TOPIC = "ancient_history"
+RECHECK_INTERVAL = float(os.getenv('WORD_POOL_RECHECK_SECONDS', '30'))
+VERSION_KEY = 'word-pool:version'
+USER_TOPICS_TTL = int(os.getenv('USER_TOPICS_CACHE_TTL', '3600'))
+# Shipped lists that are not game topics
+UNLISTED = {'famous_icons'}
+
+
+def topic_slug(name):
+    """Name under which an uploaded topic is stored and picked."""
+    return name.strip().lower().replace(' ', '_')
+
+
+def read_topic_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def import_topic_files(directory, source='builtin', replace=True):
+    """Create or update one ``WordList`` per ``*.txt`` file in ``directory``.
+
+    Built-in lists keep the file name as their name. Returns the number of
+    lists written.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    count = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.txt'):
+            continue
+        name = filename[:-4] if source == 'builtin' else topic_slug(filename[:-4])
+        words = read_topic_file(os.path.join(directory, filename))
+        existing = WordList.objects.filter(name=name).first()
+        if existing is not None:
+            if not replace or (existing.source == 'builtin' and source != 'builtin'):
+                continue
+            existing.words = words
+            existing.source = source
+            existing.listed = name not in UNLISTED
+            existing.save()
+        else:
+            WordList.objects.create(name=name, source=source, listed=name not in UNLISTED, words=words)
+        count += 1
+    return count
+
+
+def _etag(names):
+    return hashlib.sha256('\n'.join(names).encode('utf-8')).hexdigest()[:32]
+
+
+class WordPool:
+    def __init__(self, recheck_interval=RECHECK_INTERVAL):
+        self.recheck_interval = recheck_interval
+        # (lists, names, etag), replaced as a whole so readers never see a mix
+        self._state = None
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def _cache(self):
+        return caches[getattr(settings, 'WORD_POOL_CACHE', 'default')]
+
+    def _shared_version(self):
+        try:
+            version = self._cache.get(VERSION_KEY)
+            if version is None:
+                # First node up (or the key was evicted): everyone reloads once
+                self._cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+                version = self._cache.get(VERSION_KEY)
+        except Exception as e:
+            # Keep serving the lists this node has until the cache is back
+            logger.warning("Could not read word pool version: %s", e)
+            return self._version
+        return version
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.recheck_interval:
+            return
+        version = self._shared_version()
+        with self._lock:
+            if version != self._version:
+                self._state = None
+                self._version = version
+            self._checked_at = now
+
+    def _loaded(self):
+        self._sync()
+        state = self._state
+        if state is None:
+            state = self._load()
+        return state
+
+    def _load(self):
+        version = self._version
+        lists, names = {}, []
+        for name, listed, words in WordList.objects.values_list('name', 'listed', 'words'):
+            lists[name] = tuple(w for w in (words or ()) if isinstance(w, str) and w)
+            if listed:
+                names.append(name)
+        names = tuple(sorted(names))
+        state = (lists, names, _etag(names))
+        with self._lock:
+            # Lists changed while reading: serve this once, keep nothing stale
+            if self._version == version:
+                self._state = state
+        return state
+
+    def preload(self):
+        """Load every word list with one query."""
+        self._sync()
+        self._load()
+
+    def words(self, topic):
+        """Return the tuple of words for ``topic`` (empty if unknown or empty)."""
+        return self._loaded()[0].get(topic, ())
+
+    def topic_names(self):
+        """Sorted names of every playable topic."""
+        return self._loaded()[1]
+
+    def topics_etag(self):
+        """Entity tag of ``topic_names()``; the same on every node for the same list."""
+        return self._loaded()[2]
+
+    def invalidate(self):
+        """Make every node re-read its word lists (called on every ``WordList`` change)."""
+        version = uuid.uuid4().hex
+        try:
+            self._cache.set(VERSION_KEY, version, None)
+        except Exception as e:
+            logger.warning("Could not publish word pool version: %s", e)
+        with self._lock:
+            self._state = None
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def pick(self, topic):
+        """Pick a random word, falling back to ``DEFAULT_TOPIC``.
+
+        Returns ``(word, topic_used)``.
+        """
+        words = self.words(topic)
+        if not words:
+            logger.info("Topic '%s' not found or empty, defaulting to %s", topic, DEFAULT_TOPIC)
+            topic = DEFAULT_TOPIC
+            words = self.words(topic)
+        return random.choice(words), topic
+
+
+word_pool = WordPool()
+
+
+def _user_topics_key(user_id):
+    return f'user-topics:{user_id}'
+
+
+def user_topic_names(user_id):
+    """Return ``(names, etag)`` for the topics a user has created or uploaded.
+
+    Cached in ``WORD_POOL_CACHE``; any change to one of the user's ``Topic``
+    rows drops the entry. Read from the database while the cache is down.
+    """
+    cache = word_pool._cache
+    key = _user_topics_key(user_id)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning("Could not read cached topics of user %s: %s", user_id, e)
+        cached = None
+    if cached is None:
+        names = tuple(Topic.objects.filter(user_id=user_id).order_by('topic_name').values_list('topic_name', flat=True))
+        cached = (names, _etag(names))
+        try:
+            cache.set(key, cached, USER_TOPICS_TTL)
+        except Exception as e:
+            logger.warning("Could not cache topics of user %s: %s", user_id, e)
+    return cached
+
+
+def _forget_user_topics(key):
+    try:
+        word_pool._cache.delete(key)
+    except Exception as e:
+        # Entries written before the outage expire after USER_TOPICS_CACHE_TTL
+        logger.warning("Could not drop cached topics %s: %s", key, e)
+
+
+@receiver(post_save, sender=WordList)
+@receiver(post_delete, sender=WordList)
+def _word_list_changed(sender, instance, **kwargs):
+    word_pool.invalidate()
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def _topic_changed(sender, instance, **kwargs):
+    if instance.user_id is None:
+        return
+    key = _user_topics_key(instance.user_id)
+    _forget_user_topics(key)
+    # Again once committed, in case a reader cached the old rows meanwhile
+    transaction.on_commit(lambda: _forget_user_topics(key))
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables from .env file
 load_dotenv()
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    "api.metrics.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -87,13 +90,90 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE: 'sqlite' (the default, BASE_DIR/db.sqlite3) or 'postgresql'
+# (`pip install "psycopg[binary,pool]"`). SQLite serialises writers, so it runs
+# in WAL mode and waits SQLITE_BUSY_TIMEOUT seconds for the write lock instead
+# of failing; transactions take that lock up front (IMMEDIATE) so a guess that
+# reads and then writes cannot deadlock against another one.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv('DB_NAME', 'backend'),
+            "USER": os.getenv('DB_USER', 'postgres'),
+            "PASSWORD": os.getenv('DB_PASSWORD', ''),
+            "HOST": os.getenv('DB_HOST', '127.0.0.1'),
+            "PORT": os.getenv('DB_PORT', '5432'),
+            # Persistent connections, checked before reuse
+            "CONN_MAX_AGE": int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            "CONN_HEALTH_CHECKS": os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+            "OPTIONS": {},
+        }
+    }
+    if os.getenv('DB_POOL', 'False') == 'True':
+        # psycopg's pool replaces persistent connections (Django requires CONN_MAX_AGE=0)
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            "max_size": int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            "timeout": float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv('DB_NAME', str(BASE_DIR / "db.sqlite3")),
+            "OPTIONS": {
+                "timeout": float(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+                "transaction_mode": os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+                "init_command": (
+                    f"PRAGMA journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')};"
+                    f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')};"
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be sqlite or postgresql, not {DB_ENGINE!r}")
+
+
+# Cache
+# CACHE_BACKEND: 'locmem' (per process, the default), 'diskcache' (shared by
+# the processes on one host), 'redis' or 'memcached' (shared by every node;
+# need `pip install redis` / `pip install pymemcache`), or 'dummy'.
+# CACHE_LOCATION overrides the directory / server URL.
+
+_CACHE_BACKENDS = {
+    'locmem': ("django.core.cache.backends.locmem.LocMemCache", "default"),
+    'diskcache': ("diskcache.DjangoCache", str(BASE_DIR / ".cache" / "django")),
+    'redis': ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+    'memcached': ("django.core.cache.backends.memcached.PyMemcacheCache", "127.0.0.1:11211"),
+    'dummy': ("django.core.cache.backends.dummy.DummyCache", ""),
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND not in _CACHE_BACKENDS:
+    raise ImproperlyConfigured(f"CACHE_BACKEND must be one of {', '.join(_CACHE_BACKENDS)}, not {CACHE_BACKEND!r}")
+_cache_class, _cache_location = _CACHE_BACKENDS[CACHE_BACKEND]
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": _cache_class,
+        "LOCATION": os.getenv('CACHE_LOCATION', _cache_location),
+        "TIMEOUT": int(os.getenv('CACHE_TIMEOUT', '300')),
+        "KEY_PREFIX": os.getenv('CACHE_KEY_PREFIX', ''),
     }
 }
-
+if CACHE_BACKEND == 'diskcache':
+    CACHES["default"]["SHARDS"] = int(os.getenv('CACHE_SHARDS', '8'))
+    CACHES["default"]["OPTIONS"] = {'size_limit': int(os.getenv('CACHE_SIZE_LIMIT', str(256 * 1024 * 1024)))}
+
+# Sessions: 'db' (the default), 'cache' (cache only, lost when evicted) or
+# 'cached_db' (cache in front of the database)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+if SESSION_BACKEND not in ('db', 'cache', 'cached_db'):
+    raise ImproperlyConfigured(f"SESSION_BACKEND must be db, cache or cached_db, not {SESSION_BACKEND!r}")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+SESSION_CACHE_ALIAS = "default"
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,10 +218,95 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+
+# Token lookups are cached per process (see api/authentication.py)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '1024'))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_TTL', '60'))
+
+# Word descriptions shown at the end of a round are generated in the background
+WORD_DESCRIPTION_ASYNC = os.getenv('WORD_DESCRIPTION_ASYNC', 'True') == 'True'
+WORD_DESCRIPTION_WORKERS = int(os.getenv('WORD_DESCRIPTION_WORKERS', '4'))
+# Pending descriptions older than this are queued again when polled (lost on restart)
+WORD_DESCRIPTION_STALE_SECONDS = int(os.getenv('WORD_DESCRIPTION_STALE_SECONDS', '30'))
+
+# PromptLog rows are buffered and written in batches by a background thread
+PROMPT_LOG_ASYNC = os.getenv('PROMPT_LOG_ASYNC', 'True') == 'True'
+PROMPT_LOG_BATCH_SIZE = int(os.getenv('PROMPT_LOG_BATCH_SIZE', '50'))
+PROMPT_LOG_FLUSH_INTERVAL = float(os.getenv('PROMPT_LOG_FLUSH_INTERVAL', '2.0'))
+PROMPT_LOG_QUEUE_SIZE = int(os.getenv('PROMPT_LOG_QUEUE_SIZE', '10000'))
+PROMPT_LOG_OVERFLOW = os.getenv('PROMPT_LOG_OVERFLOW', 'drop')  # 'drop' or 'block'
+PROMPT_LOG_BLOCK_TIMEOUT = float(os.getenv('PROMPT_LOG_BLOCK_TIMEOUT', '1.0'))
+
+# Model backend behind chatbot.gemini_interface: 'gemini', 'local' (offline,
+# deterministic stand-in for load tests and CI) or a dotted class path
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+if LLM_BACKEND == 'local':
+    LLM_BACKEND_OPTIONS = {
+        'latency': float(os.getenv('LLM_LOCAL_LATENCY', '0.2')),
+        'tokens_per_second': float(os.getenv('LLM_LOCAL_TOKENS_PER_SECOND', '50')),
+        'tokens_per_chunk': int(os.getenv('LLM_LOCAL_TOKENS_PER_CHUNK', '4')),
+    }
+elif LLM_BACKEND == 'gemini':
+    LLM_BACKEND_OPTIONS = {'model_name': os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')}
+else:
+    # Custom backends are constructed without arguments
+    LLM_BACKEND_OPTIONS = {}
+
+# Guess prompts: history trimmed to a token budget, context cached per conversation
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1024'))
+PROMPT_CONTEXT_CACHE = os.getenv('PROMPT_CONTEXT_CACHE', 'default')
+PROMPT_CONTEXT_TTL = int(os.getenv('PROMPT_CONTEXT_TTL', '3600'))
+PROMPT_CONTEXT_MAX_MESSAGES = int(os.getenv('PROMPT_CONTEXT_MAX_MESSAGES', '50'))
+
+# PDF uploads (upload-terms/) are spooled to disk and processed as background jobs
+PDF_INGEST_ASYNC = os.getenv('PDF_INGEST_ASYNC', 'True') == 'True'
+PDF_INGEST_WORKERS = int(os.getenv('PDF_INGEST_WORKERS', '2'))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', '4'))
+PDF_UPLOAD_MAX_BYTES = int(os.getenv('PDF_UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '500'))
+PDF_PAGES_PER_CHUNK = int(os.getenv('PDF_PAGES_PER_CHUNK', '20'))
+PDF_INGEST_TMP_DIR = os.getenv('PDF_INGEST_TMP_DIR') or None
+
+# Word lists live in the database; nodes publish changes through this cache
+WORD_POOL_CACHE = os.getenv('WORD_POOL_CACHE', 'default')
+
+# Replies to repeated clues are replayed from api.guess_cache; topic lists are
+# comma separated (GUESS_CACHE_TOPICS empty means every topic)
+GUESS_CACHE_ENABLED = os.getenv('GUESS_CACHE_ENABLED', 'True') == 'True'
+GUESS_CACHE_FUZZY = os.getenv('GUESS_CACHE_FUZZY', 'False') == 'True'
+GUESS_CACHE_TOPICS = [t.strip().lower() for t in os.getenv('GUESS_CACHE_TOPICS', '').split(',') if t.strip()]
+GUESS_CACHE_EXCLUDE_TOPICS = [
+    t.strip().lower() for t in os.getenv('GUESS_CACHE_EXCLUDE_TOPICS', '').split(',') if t.strip()
+]
+
+# Request/model metrics in the Prometheus format at /metrics (see api/metrics.py);
+# set METRICS_TOKEN to require "Authorization: Bearer <token>" there
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Logging: LOG_LEVEL for the api and chatbot apps (DEBUG adds one line per
+# request with its timings), LOG_FORMAT 'text' or 'json' (one object per line)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "text": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+        "json": {"()": "api.log_format.JsonFormatter"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": LOG_FORMAT},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+        "chatbot": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
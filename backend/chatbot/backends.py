@@ -0,0 +1,209 @@
+"""
+Model backends behind ``gemini_interface``.
+
+The backend is chosen with ``settings.LLM_BACKEND``: ``'gemini'`` (default),
+``'local'``, or the dotted path of a class. ``settings.LLM_BACKEND_OPTIONS`` is
+passed to its constructor. A backend's ``get_model()`` returns an object with
+the ``generate_content`` / ``generate_content_async`` interface of
+``genai.GenerativeModel``; ``client.GeminiClient`` wraps it either way.
+
+``LocalBackend`` runs in-process and never touches the network, so load tests
+and CI can drive the API at full request rates and measure request handling
+separately from model latency.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import google.generativeai as genai
+except Exception:
+    genai = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiBackend:
+    name = 'gemini'
+
+    def __init__(self, model_name='gemini-2.0-flash', api_key=None):
+        self.model_name = model_name
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
+        self.model = None
+        if genai is not None and self.api_key:
+            try:
+                genai.configure(api_key=self.api_key)
+                self.model = genai.GenerativeModel(model_name)
+            except Exception as e:
+                # Configuration failed (bad key or model name)
+                logger.error("Gemini configuration error: %s", e)
+
+    def get_model(self):
+        if genai is None:
+            raise RuntimeError("Gemini SDK (google-generativeai) is not installed in this environment")
+        if not self.api_key:
+            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is missing from environment/.env")
+        if self.model is None:
+            raise RuntimeError("Gemini model not configured (check API key validity and model name)")
+        return self.model
+
+
+DEFAULT_LOCAL_WORDS = (
+    "Julius Caesar", "Cleopatra", "Alexander the Great", "Hannibal", "Augustus",
+    "The Parthenon", "Spartacus", "Ramesses II", "Nero", "I don't know",
+)
+
+
+class _Usage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class _Chunk:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _LocalResponse:
+    """Looks like the SDK's (streamed) ``GenerateContentResponse``."""
+
+    def __init__(self, text, chunks, latency, chunk_delay, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self._chunks = chunks
+        self._latency = latency
+        self._chunk_delay = chunk_delay
+
+    def _chunk(self, i, piece):
+        # Like the real stream, the final chunk carries the usage totals
+        return _Chunk(piece, self.usage_metadata if i == len(self._chunks) - 1 else None)
+
+    def __iter__(self):
+        time.sleep(self._latency)
+        for i, piece in enumerate(self._chunks):
+            if i:
+                time.sleep(self._chunk_delay)
+            yield self._chunk(i, piece)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._latency)
+        for i, piece in enumerate(self._chunks):
+            if i:
+                await asyncio.sleep(self._chunk_delay)
+            yield self._chunk(i, piece)
+
+
+class LocalBackend:
+    """
+    Deterministic in-process stand-in for Gemini.
+
+    Answers depend only on the prompt (and ``seed``): guesses are picked from
+    ``words``, PDF extraction returns a JSON term list and description prompts
+    get a canned sentence. Replies arrive after ``latency`` seconds and then
+    stream at ``tokens_per_second``, ``tokens_per_chunk`` tokens per chunk.
+    """
+    name = 'local'
+
+    def __init__(self, latency=0.2, tokens_per_second=50.0, tokens_per_chunk=4, words=None, seed=0):
+        self.latency = float(latency)
+        self.tokens_per_second = float(tokens_per_second)
+        self.tokens_per_chunk = max(1, int(tokens_per_chunk))
+        self.words = tuple(words or DEFAULT_LOCAL_WORDS)
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        return self
+
+    def _pick(self, text, offset=0):
+        digest = hashlib.sha256(f"{self.seed}:{offset}:{text}".encode()).digest()
+        return self.words[int.from_bytes(digest[:8], 'big') % len(self.words)]
+
+    def answer(self, contents):
+        if isinstance(contents, list):
+            # PDF term extraction: [prompt, {"mime_type": ..., "data": ...}]
+            key = hashlib.sha256(repr(contents).encode()).hexdigest()
+            terms = list(dict.fromkeys(self._pick(key, i) for i in range(20)))
+            return json.dumps({"terms": terms})
+        match = re.search(r"description of '(.+?)'(?: in the context of .*)?\. Be concise", contents)
+        if match:
+            return f"{match.group(1)} is a notable subject, described here by the local model backend."
+        return self._pick(contents)
+
+    def _tokens(self, text):
+        return re.findall(r"\S+\s*", text) or [text]
+
+    def _split(self, text):
+        tokens = self._tokens(text)
+        step = self.tokens_per_chunk
+        return [''.join(tokens[i:i + step]) for i in range(0, len(tokens), step)]
+
+    def _response(self, contents):
+        with self._lock:
+            self.calls += 1
+        text = self.answer(contents)
+        prompt = contents if isinstance(contents, str) else str(contents[0])
+        usage = _Usage(len(self._tokens(prompt)), len(self._tokens(text)))
+        chunk_delay = self.tokens_per_chunk / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        return _LocalResponse(text, self._split(text), self.latency, chunk_delay, usage)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        response = self._response(contents)
+        if not stream:
+            for _ in response:
+                pass
+        return response
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        response = self._response(contents)
+        if not stream:
+            async for _ in response:
+                pass
+        return response
+
+
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'local': LocalBackend,
+}
+
+_backend = None
+_lock = threading.Lock()
+
+
+def load_backend(name=None, options=None):
+    if name is None:
+        name = getattr(settings, 'LLM_BACKEND', 'gemini')
+    if options is None:
+        options = getattr(settings, 'LLM_BACKEND_OPTIONS', {})
+    cls = BACKENDS.get(name) or import_string(name)
+    return cls(**options)
+
+
+def get_backend():
+    """The process-wide backend, created from settings on first use."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = load_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the active backend (benchmarks, tests); returns the previous one."""
+    global _backend
+    with _lock:
+        previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,440 @@
+"""
+Resilient wrapper around the Gemini model used by ``gemini_interface``.
+
+Every model call goes through one ``GeminiClient`` which adds:
+
+- a per-call deadline (``GEMINI_TIMEOUT`` seconds): blocking SDK calls, and
+  every wait for a stream chunk, run on a pool of ``GEMINI_MAX_CONCURRENCY``
+  threads and the caller gives up on them when the deadline passes, so a hung
+  upstream cannot hold a request thread (SDKs that accept ``request_options``
+  also get the timeout);
+- bounded concurrency (``GEMINI_MAX_CONCURRENCY``): callers that cannot get a
+  slot before their deadline fail fast instead of piling up worker threads;
+- retries with full-jitter exponential backoff for transient upstream errors
+  (``GEMINI_MAX_RETRIES``, ``GEMINI_BACKOFF_BASE``, ``GEMINI_BACKOFF_MAX``);
+- a circuit breaker that rejects calls for ``GEMINI_BREAKER_RESET`` seconds
+  after ``GEMINI_BREAKER_THRESHOLD`` consecutive failures.
+
+The SDK keeps one gRPC channel per process, so all calls share its connections.
+Callers may pass a ``CallMetrics`` to collect token usage and timings of a call;
+``observers`` are handed every call's metrics and error once it has finished.
+"""
+import asyncio
+import concurrent.futures
+import inspect
+import logging
+import os
+import random
+import threading
+import time
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except Exception:
+    google_exceptions = None  # type: ignore
+
+TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '30'))
+MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))
+MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', '8'))
+BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(RuntimeError):
+    """Base class for failures raised by the client layer."""
+
+
+class DeadlineExceeded(LLMError):
+    pass
+
+
+class Overloaded(LLMError):
+    """No concurrency slot became free before the deadline."""
+
+
+class CircuitOpen(LLMError):
+    """The upstream is considered degraded; the call was not attempted."""
+
+
+_RETRYABLE = (DeadlineExceeded, TimeoutError, ConnectionError)
+if google_exceptions is not None:
+    _RETRYABLE += (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+
+
+# Returned by next() once a stream is exhausted
+_END = object()
+
+
+def is_retryable(error):
+    return isinstance(error, _RETRYABLE)
+
+
+class CallMetrics:
+    """Token usage and timings of one model call, in seconds from its start.
+
+    Token counts are the ones reported in the response's ``usage_metadata``
+    and stay ``None`` when the model does not report them.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.first_chunk_time = None
+        self.chunk_gaps = []
+        self.total_time = None
+        self.attempts = 0
+        self._start = None
+        self._last_chunk = None
+
+    def start(self):
+        self._start = self._last_chunk = time.perf_counter()
+
+    def chunk(self, chunk):
+        now = time.perf_counter()
+        if self.first_chunk_time is None:
+            self.first_chunk_time = now - self._start
+        else:
+            self.chunk_gaps.append(now - self._last_chunk)
+        self._last_chunk = now
+        self.usage(chunk)
+
+    def usage(self, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            # Streams repeat the running totals; the last chunk has the final ones
+            self.prompt_tokens = getattr(usage, 'prompt_token_count', None) or self.prompt_tokens
+            self.completion_tokens = getattr(usage, 'candidates_token_count', None) or self.completion_tokens
+
+    def finish(self):
+        if self._start is not None:
+            self.total_time = time.perf_counter() - self._start
+
+    @property
+    def max_chunk_gap(self):
+        return max(self.chunk_gaps) if self.chunk_gaps else None
+
+    @property
+    def mean_chunk_gap(self):
+        return sum(self.chunk_gaps) / len(self.chunk_gaps) if self.chunk_gaps else None
+
+    def log_fields(self):
+        """Keyword arguments for the matching ``PromptLog`` columns."""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "first_chunk_time": self.first_chunk_time,
+            "max_chunk_gap": self.max_chunk_gap,
+            "mean_chunk_gap": self.mean_chunk_gap,
+            "model_time": self.total_time,
+        }
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                # Let a single trial call through
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release_trial(self):
+        """Hand back a trial that ended without an outcome, so another call can take it."""
+        with self._lock:
+            self._trial = False
+
+
+class GeminiClient:
+    def __init__(self, get_model, timeout=TIMEOUT, max_concurrency=MAX_CONCURRENCY,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 breaker=None):
+        self._get_model = get_model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Runs the blocking SDK calls so callers can stop waiting at their deadline
+        self._calls = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='gemini-call')
+        self._async_slots = {}
+        # Called as observer(kind, metrics, error) once each call has finished
+        self.observers = []
+
+    # -- helpers -------------------------------------------------------
+
+    def _deadline(self, timeout):
+        return time.monotonic() + (self.timeout if timeout is None else timeout)
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Gemini call exceeded its deadline")
+        return remaining
+
+    def _call_kwargs(self, model, deadline):
+        try:
+            params = inspect.signature(model.generate_content).parameters
+        except (TypeError, ValueError):
+            return {}
+        if 'request_options' in params:
+            return {'request_options': {'timeout': self._remaining(deadline)}}
+        return {}
+
+    def _wait(self, deadline, fn, *args, **kwargs):
+        """Run the blocking ``fn`` on the call pool; raise ``DeadlineExceeded`` if it outlives ``deadline``.
+
+        A call that is given up on keeps its pool thread until the SDK returns,
+        but no longer holds the caller or its concurrency slot.
+        """
+        remaining = self._remaining(deadline)
+        future = self._calls.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded("Gemini call exceeded its deadline") from None
+
+    def _backoff(self, attempt, deadline):
+        """Seconds to sleep before retry ``attempt``, or ``None`` to give up."""
+        if attempt > self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpen("Gemini circuit breaker is open")
+
+    def _acquire(self, deadline):
+        try:
+            acquired = self._slots.acquire(timeout=self._remaining(deadline))
+        except DeadlineExceeded:
+            self.breaker.release_trial()
+            raise
+        if not acquired:
+            self.breaker.release_trial()
+            raise Overloaded("Too many concurrent Gemini calls")
+
+    def _observe(self, kind, metrics, error=None):
+        if metrics.total_time is None:
+            metrics.finish()  # rejected before the call was made
+        for observer in self.observers:
+            try:
+                observer(kind, metrics, error)
+            except Exception as e:
+                logger.warning("Call observer %r failed: %s", observer, e)
+
+    # -- sync API ------------------------------------------------------
+
+    def generate(self, contents, timeout=None, metrics=None):
+        """Blocking ``generate_content`` with deadline, retries and breaker."""
+        metrics = CallMetrics() if metrics is None else metrics
+        try:
+            response = self._generate(contents, timeout, metrics)
+        except Exception as e:
+            self._observe('generate', metrics, e)
+            raise
+        self._observe('generate', metrics)
+        return response
+
+    def _generate(self, contents, timeout, metrics):
+        deadline = self._deadline(timeout)
+        metrics.start()
+        attempt = 0
+        while True:
+            # Configuration errors are raised here and never trip the breaker
+            model = self._get_model()
+            self._check_breaker()
+            self._acquire(deadline)
+            metrics.attempts += 1
+            try:
+                response = self._wait(deadline, model.generate_content, contents, **self._call_kwargs(model, deadline))
+            except Exception as e:
+                self.breaker.record_failure()
+                attempt += 1
+                delay = self._backoff(attempt, deadline) if is_retryable(e) else None
+                if delay is None:
+                    metrics.finish()
+                    raise
+            else:
+                self.breaker.record_success()
+                metrics.usage(response)
+                metrics.finish()
+                return response
+            finally:
+                self._slots.release()
+            time.sleep(delay)
+
+    def stream(self, contents, timeout=None, metrics=None):
+        """Yield text chunks. Retries happen only before the first chunk."""
+        metrics = CallMetrics() if metrics is None else metrics
+        try:
+            yield from self._stream(contents, timeout, metrics)
+        except Exception as e:
+            self._observe('stream', metrics, e)
+            raise
+        self._observe('stream', metrics)
+
+    def _stream(self, contents, timeout, metrics):
+        deadline = self._deadline(timeout)
+        metrics.start()
+        attempt = 0
+        while True:
+            # Configuration errors are raised here and never trip the breaker
+            model = self._get_model()
+            self._check_breaker()
+            self._acquire(deadline)
+            metrics.attempts += 1
+            started = False
+            try:
+                response = self._wait(
+                    deadline, model.generate_content, contents, stream=True, **self._call_kwargs(model, deadline)
+                )
+                chunks = iter(response)
+                while True:
+                    chunk = self._wait(deadline, next, chunks, _END)
+                    if chunk is _END:
+                        break
+                    metrics.chunk(chunk)
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                self.breaker.record_failure()
+                attempt += 1
+                delay = self._backoff(attempt, deadline) if is_retryable(e) and not started else None
+                if delay is None:
+                    metrics.finish()
+                    raise
+            except BaseException:
+                # Closed early or cancelled: the call says nothing about the upstream
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                metrics.finish()
+                return
+            finally:
+                self._slots.release()
+            time.sleep(delay)
+
+    # -- async API -----------------------------------------------------
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_slots.get(loop)
+        if semaphore is None:
+            semaphore = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def stream_async(self, contents, timeout=None, metrics=None):
+        """Async ``stream``, using the SDK's ``generate_content_async``."""
+        metrics = CallMetrics() if metrics is None else metrics
+        try:
+            async for text in self._stream_async(contents, timeout, metrics):
+                yield text
+        except Exception as e:
+            self._observe('stream_async', metrics, e)
+            raise
+        self._observe('stream_async', metrics)
+
+    async def _stream_async(self, contents, timeout, metrics):
+        deadline = self._deadline(timeout)
+        metrics.start()
+        semaphore = self._async_semaphore()
+        attempt = 0
+        while True:
+            # Configuration errors are raised here and never trip the breaker
+            model = self._get_model()
+            self._check_breaker()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self.breaker.release_trial()
+                raise Overloaded("Too many concurrent Gemini calls")
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            metrics.attempts += 1
+            started = False
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(contents, stream=True, **self._call_kwargs(model, deadline)),
+                    self._remaining(deadline),
+                )
+                iterator = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), self._remaining(deadline))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded("Gemini call exceeded its deadline")
+                    metrics.chunk(chunk)
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                self.breaker.record_failure()
+                attempt += 1
+                delay = self._backoff(attempt, deadline) if is_retryable(e) and not started else None
+                if delay is None:
+                    metrics.finish()
+                    raise
+            except BaseException:
+                # Closed early or cancelled: the call says nothing about the upstream
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                metrics.finish()
+                return
+            finally:
+                semaphore.release()
+            await asyncio.sleep(delay)
@@ -0,0 +1,37 @@
+"""
+Persistent cache of word descriptions, keyed by (word, topic).
+
+Backed by ``diskcache`` so it survives restarts and is shared by every worker
+process on the host. Entries expire after ``DESCRIPTION_CACHE_TTL`` seconds and
+the least recently used ones are evicted once the cache grows past
+``DESCRIPTION_CACHE_SIZE_LIMIT`` bytes. Hit/miss counters are kept by diskcache
+itself (``statistics=True``) and are read with ``stats()``.
+"""
+import os
+
+from chatbot.disk_cache import DiskCache
+
+CACHE_DIR = os.getenv(
+    'DESCRIPTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'descriptions'),
+)
+TTL = int(os.getenv('DESCRIPTION_CACHE_TTL', str(30 * 24 * 3600)))
+SIZE_LIMIT = int(os.getenv('DESCRIPTION_CACHE_SIZE_LIMIT', str(64 * 1024 * 1024)))
+
+disk = DiskCache(CACHE_DIR, SIZE_LIMIT)
+get_cache = disk.get
+stats = disk.stats
+clear = disk.clear
+
+
+def _key(word, topic):
+    return ('description', (word or "").strip().lower(), (topic or "").strip().lower())
+
+
+def lookup(word, topic=""):
+    """Return the cached description or ``None``."""
+    return get_cache().get(_key(word, topic))
+
+
+def store(word, topic, description):
+    get_cache().set(_key(word, topic), description, expire=TTL)
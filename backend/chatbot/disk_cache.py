@@ -0,0 +1,55 @@
+"""
+The ``diskcache`` store behind the description, PDF term and guess caches.
+
+Each of those modules keeps one ``DiskCache``: a ``diskcache.Cache`` opened on
+first use with least-recently-used eviction past ``size_limit`` bytes and its
+hit/miss counters turned on. Being on disk, the entries survive restarts and
+are shared by every worker process on the host.
+"""
+import threading
+
+import diskcache
+
+
+class DiskCache:
+    def __init__(self, directory, size_limit):
+        self.directory = directory
+        self.size_limit = size_limit
+        self.cache = None  # opened by get()
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.cache is None:
+            with self._lock:
+                if self.cache is None:
+                    self.cache = diskcache.Cache(
+                        self.directory,
+                        size_limit=self.size_limit,
+                        eviction_policy='least-recently-used',
+                        statistics=True,
+                    )
+        return self.cache
+
+    def replace(self, cache):
+        """Use ``cache`` from now on (benchmarks, tests); returns the previous one."""
+        with self._lock:
+            previous, self.cache = self.cache, cache
+        return previous
+
+    def stats(self):
+        """Return ``{"hits", "misses", "hit_rate", "entries", "volume"}``."""
+        cache = self.get()
+        hits, misses = cache.stats()
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else None,
+            "entries": len(cache),
+            "volume": cache.volume(),
+        }
+
+    def clear(self):
+        cache = self.get()
+        cache.clear()
+        cache.stats(reset=True)
@@ -1,69 +1,104 @@
-import os
 import json
+import logging
 import re
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None  # type: ignore
 from dotenv import load_dotenv
 
+from chatbot import backends, description_cache
+from chatbot.client import CallMetrics, GeminiClient
+
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
-
-if genai is not None:
-    if GEMINI_API_KEY:
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-        except Exception as _e:
-            # Configuration failed (bad key or model name)
-            print(f"Gemini configuration error: {_e}")
-            model = None  # type: ignore
-    else:
-        model = None  # type: ignore
-else:
-    model = None  # type: ignore
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = """You are playing a game with the user that has a few simple rules. The user has a secret word which it is going to try to
 describe without saying the word itself. You have to guess the word based on the user's description. Only respond with your guess. You are allowed to say "I don't know" if the sentence could be describing many things or doesn't make sense. If the guess is a person, use their full name. 
 Do not use accents on your letters. Do not ask any questions. You should not guess the same thing twice in a row"""
 
-def get_gemini_response(prompt: str) -> str:
+# Built once; every guess prompt is PROMPT_PREFIX + prompt + PROMPT_SUFFIX
+PROMPT_PREFIX = f"{SYSTEM_PROMPT}\n\nUser: "
+PROMPT_SUFFIX = "\nAssistant:"
+# Sent in place of a reply when the model call fails
+ERROR_REPLY = "I apologize, but I encountered an error while processing your request. Please try again."
+
+
+def _get_model():
+    # Gemini by default; see backends.py and settings.LLM_BACKEND
+    return backends.get_backend().get_model()
+
+
+# Deadlines, concurrency limits, retries and the circuit breaker live in client.py
+client = GeminiClient(_get_model)
+
+def get_gemini_response(prompt: str, metrics: CallMetrics = None) -> str:
     try:
-        if genai is None:
-            raise RuntimeError("Gemini SDK (google-generativeai) is not installed in this environment")
-        if not GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is missing from environment/.env")
-        if model is None:
-            raise RuntimeError("Gemini model not configured (check API key validity and model name)")
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {prompt}\nAssistant:"
-        response = model.generate_content(full_prompt)
+        full_prompt = PROMPT_PREFIX + prompt + PROMPT_SUFFIX
+        response = client.generate(full_prompt, metrics=metrics)
         return response.text.strip()
     except Exception as e:
-        print(f"Error generating response: {str(e)}")
-        return "I apologize, but I encountered an error while processing your request. Please try again."
+        logger.error("Error generating response (%s): %s", type(e).__name__, e)
+        return ERROR_REPLY
+
+def get_gemini_response_stream(prompt, metrics=None):
+    try:
+        full_prompt = PROMPT_PREFIX + prompt + PROMPT_SUFFIX
+        for text in client.stream(full_prompt, metrics=metrics):
+            yield text
+
+    except Exception as e:
+        logger.error("Error in streaming response (%s): %s", type(e).__name__, e)
+        yield ERROR_REPLY
+
 
-def get_gemini_response_stream(prompt):
+async def get_gemini_response_stream_async(prompt, metrics=None):
+    """Async counterpart of ``get_gemini_response_stream`` for the ASGI chat view.
+
+    Uses the SDK's native ``generate_content_async`` so an open stream holds no
+    thread while waiting on the model.
+    """
     try:
-        if genai is None:
-            raise RuntimeError("Gemini SDK (google-generativeai) is not installed in this environment")
-        if not GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is missing from environment/.env")
-        if model is None:
-            raise RuntimeError("Gemini model not configured (check API key validity and model name)")
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {prompt}\nAssistant:"
-        response = model.generate_content(full_prompt, stream=True)
-        for chunk in response:
-            if chunk.text:
-                yield chunk.text
-                
+        full_prompt = PROMPT_PREFIX + prompt + PROMPT_SUFFIX
+        async for text in client.stream_async(full_prompt, metrics=metrics):
+            yield text
+
     except Exception as e:
-        print(f"Error in streaming response: {str(e)}")
-        yield "I apologize, but I encountered an error while processing your request. Please try again."
+        logger.error("Error in async streaming response (%s): %s", type(e).__name__, e)
+        yield ERROR_REPLY
+
+
+def merge_terms(term_lists, max_terms):
+    """Merge term lists round-robin, dropping case-insensitive duplicates.
+
+    Taking one term from each list in turn keeps every part of a chunked
+    document represented when ``max_terms`` cuts the result short.
+    """
+    seen = set()
+    result = []
+    exhausted = object()
+    iterators = [iter(terms) for terms in term_lists]
+    while iterators and len(result) < max_terms:
+        for it in list(iterators):
+            t = next(it, exhausted)
+            if t is exhausted:
+                iterators.remove(it)
+                continue
+            if not isinstance(t, str):
+                continue
+            cleaned = t.strip()
+            if cleaned and cleaned.lower() not in seen:
+                seen.add(cleaned.lower())
+                result.append(cleaned)
+            if len(result) >= max_terms:
+                break
+    return result
+
 
+def extract_terms_from_pdf(pdf_bytes: bytes, max_terms: int = 150, raise_errors: bool = False) -> list:
+    """Ask the model for up to ``max_terms`` key terms of a PDF.
 
-def extract_terms_from_pdf(pdf_bytes: bytes, max_terms: int = 150) -> list:
+    Model and parsing errors are logged and give ``[]``, unless ``raise_errors``
+    is set, in which case they propagate so the caller can tell a failed
+    extraction from a document without terms.
+    """
     if not pdf_bytes:
         raise ValueError("No PDF bytes provided")
 
@@ -78,14 +113,8 @@ def extract_terms_from_pdf(pdf_bytes: bytes, max_terms: int = 150) -> list:
             )
 
     try:
-        if genai is None:
-            raise RuntimeError("Gemini SDK (google-generativeai) is not installed in this environment")
-        if not GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is missing from environment/.env")
-        if model is None:
-            raise RuntimeError("Gemini model not configured (check API key validity and model name)")
         file_part = {"mime_type": "application/pdf", "data": pdf_bytes}
-        response = model.generate_content([prompt, file_part])
+        response = client.generate([prompt, file_part])
         text = (response.text or "").strip()
 
         def _extract_json(s: str) -> dict:
@@ -98,20 +127,11 @@ def extract_terms_from_pdf(pdf_bytes: bytes, max_terms: int = 150) -> list:
 
         data = _extract_json(text)
         terms = data.get("terms", []) if isinstance(data, dict) else []
-        seen = set()
-        result = []
-        for t in terms:
-            if not isinstance(t, str):
-                continue
-            cleaned = t.strip()
-            if cleaned and cleaned.lower() not in seen:
-                seen.add(cleaned.lower())
-                result.append(cleaned)
-            if len(result) >= max_terms:
-                break
-        return result
+        return merge_terms([terms], max_terms)
     except Exception as e:
-        print(f"Error extracting terms from PDF: {e}")
+        if raise_errors:
+            raise
+        logger.error("Error extracting terms from PDF (%s): %s", type(e).__name__, e)
         return []
 
 
@@ -119,20 +139,27 @@ def get_word_description(word: str, topic: str = "") -> str:
     """
     Generate a short, informative description of a word.
     Used when the player runs out of guesses or time.
+    Results are cached persistently per (word, topic), see description_cache.
     """
     try:
-        if genai is None:
-            raise RuntimeError("Gemini SDK (google-generativeai) is not installed in this environment")
-        if not GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is missing from environment/.env")
-        if model is None:
-            raise RuntimeError("Gemini model not configured (check API key validity and model name)")
-        
+        cached = description_cache.lookup(word, topic)
+    except Exception as e:
+        logger.warning("Description cache unavailable: %s", e)
+        cached = None
+    if cached is not None:
+        return cached
+
+    try:
         topic_context = f" in the context of {topic}" if topic else ""
         prompt = f"Provide a brief, informative 1-2 sentence description of '{word}'{topic_context}. Be concise and educational."
-        
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        response = client.generate(prompt)
+        description = response.text.strip()
+    except Exception as e:
+        logger.error("Error generating word description (%s): %s", type(e).__name__, e)
+        return f"'{word}' - No description available."
+
+    try:
+        description_cache.store(word, topic, description)
     except Exception as e:
-        print(f"Error generating word description: {str(e)}")
-        return f"'{word}' - No description available."
\ No newline at end of file
+        logger.warning("Could not cache description for '%s': %s", word, e)
+    return description
@@ -0,0 +1,49 @@
+"""
+Persistent cache of PDF term extraction results.
+
+Keyed by the SHA-256 of the uploaded PDF and ``max_terms``, so uploading the
+same document again (under any topic name) skips the model entirely. Stored
+with ``diskcache`` in ``TERM_CACHE_DIR`` like ``description_cache``; entries
+expire after ``TERM_CACHE_TTL`` seconds and the least recently used ones go
+once the cache exceeds ``TERM_CACHE_SIZE_LIMIT`` bytes. Bump
+``EXTRACTION_VERSION`` when the extraction prompt changes.
+"""
+import os
+
+from chatbot.disk_cache import DiskCache
+
+CACHE_DIR = os.getenv(
+    'TERM_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'pdf_terms'),
+)
+TTL = int(os.getenv('TERM_CACHE_TTL', str(90 * 24 * 3600)))
+SIZE_LIMIT = int(os.getenv('TERM_CACHE_SIZE_LIMIT', str(16 * 1024 * 1024)))
+EXTRACTION_VERSION = 1
+
+disk = DiskCache(CACHE_DIR, SIZE_LIMIT)
+get_cache = disk.get
+stats = disk.stats
+clear = disk.clear
+
+
+def _key(content_hash, max_terms):
+    return ('pdf-terms', EXTRACTION_VERSION, content_hash, int(max_terms))
+
+
+def lookup(content_hash, max_terms):
+    """Return the cached term list or ``None``."""
+    return get_cache().get(_key(content_hash, max_terms))
+
+
+def store(content_hash, max_terms, terms):
+    get_cache().set(_key(content_hash, max_terms), list(terms), expire=TTL)
+
+
+def invalidate(content_hash):
+    """Drop every cached result for the PDF with this hash; returns how many."""
+    cache = get_cache()
+    removed = 0
+    for key in list(cache.iterkeys()):
+        if isinstance(key, tuple) and key[:1] == ('pdf-terms',) and key[2] == content_hash:
+            removed += int(cache.delete(key))
+    return removed
@@ -33,6 +33,9 @@ const ChatPage = () => {
     const [conversations, setConversations] = useState<any[]>([]);
     const [currentConversationId, setCurrentConversationId] = useState<string | null>(null);
     const [isStreaming, setIsStreaming] = useState(false); // Track if a message is currently streaming
+    const [hasOlderMessages, setHasOlderMessages] = useState(false); // Older history not loaded yet
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const keepScrollRef = useRef(false); // Set while prepending older messages
 
   // Redirect to login if not authenticated
   useEffect(() => {
@@ -43,6 +46,10 @@ const ChatPage = () => {
 
   // Auto-scroll to bottom when messages change
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages, isTyping]);
 
@@ -108,6 +115,7 @@ const ChatPage = () => {
             
             console.log("Setting messages:", formattedMessages);
             setMessages(formattedMessages);
+            setHasOlderMessages(Boolean(data.has_more_messages));
           } else {
             console.error("Invalid messages data:", data.messages);
           }
@@ -137,21 +145,26 @@ const ChatPage = () => {
 
   const fetchConversations = async () => {
     try {
-      const response = await fetch('http://localhost:8000/api/conversations/', {
-        headers: {
-          'Authorization': `Token ${authContext.token}`
+      // The list is cursor-paginated, most recent first; follow `next` to the end
+      let url: string | null = 'http://localhost:8000/api/conversations/';
+      const all: any[] = [];
+      while (url) {
+        const response = await fetch(url, {
+          headers: {
+            'Authorization': `Token ${authContext.token}`
+          }
+        });
+        if (!response.ok) {
+          console.error("Failed to fetch conversations:", response.status);
+          break;
         }
-      });
-      
-      if (response.ok) {
         const data = await response.json();
-        console.log("Fetched conversations:", data);
-        setConversations(data);
-        return data;
-      } else {
-        console.error("Failed to fetch conversations:", response.status);
-        return [];
+        all.push(...data.results);
+        url = data.next;
       }
+      console.log("Fetched conversations:", all.length);
+      setConversations(all);
+      return all;
     } catch (error) {
       console.error('Error fetching conversations:', error);
       return [];
@@ -177,6 +190,7 @@ const ChatPage = () => {
         }));
         
         setMessages(formattedMessages);
+        setHasOlderMessages(Boolean(data.has_more_messages));
         setCurrentConversationId(conversationId);
         localStorage.setItem('currentConversationId', conversationId);
       }
@@ -185,8 +199,43 @@ const ChatPage = () => {
     }
   };
 
+  // Only the latest page of messages is loaded; page back with ?before=<oldest id>
+  const loadOlderMessages = async () => {
+    if (!currentConversationId || messages.length === 0 || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const response = await fetch(
+        `http://localhost:8000/api/conversations/${currentConversationId}/?before=${messages[0].id}`,
+        {
+          headers: {
+            'Authorization': `Token ${authContext.token}`
+          }
+        }
+      );
+      if (response.ok) {
+        const data = await response.json();
+        const olderMessages = data.messages.map((msg: any) => ({
+          id: msg.id.toString(),
+          sender: msg.sender,
+          message: msg.content,
+          timestamp: new Date(msg.created_at)
+        }));
+        keepScrollRef.current = true;
+        setMessages((prev) => [...olderMessages, ...prev]);
+        setHasOlderMessages(Boolean(data.has_more_messages));
+      } else {
+        console.error("Failed to load older messages:", response.status);
+      }
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const startNewConversation = () => {
     setMessages([]);
+    setHasOlderMessages(false);
     setCurrentConversationId(null);
     localStorage.removeItem('currentConversationId');
   };
@@ -614,6 +663,18 @@ const ChatPage = () => {
             </div>
           )}
 
+          {hasOlderMessages && (
+            <div className="flex justify-center mb-6">
+              <button
+                onClick={loadOlderMessages}
+                disabled={loadingOlder}
+                className="text-sm text-emerald-600 dark:text-emerald-400 hover:underline disabled:opacity-50"
+              >
+                {loadingOlder ? 'Loading…' : 'Load earlier messages'}
+              </button>
+            </div>
+          )}
+
           {messages.map((msg) => (
             <div
               key={msg.id}
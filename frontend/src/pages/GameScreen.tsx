@@ -370,15 +370,19 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
 
               // If this is the last chunk, check if AI guessed correctly
               if (eventData.done) {
-                // Fetch updated conversation to check score
-                const convResponse = await fetch(`http://localhost:8000/api/conversations/${gameSessionId}/`, {
-                  headers: {
-                    'Authorization': `Token ${authContext.token}`
-                  }
-                });
+                // The final event carries the updated game state; fall back to
+                // fetching the conversation if the server did not send it
+                let convData = eventData.state;
+                if (!convData) {
+                  const convResponse = await fetch(`http://localhost:8000/api/conversations/${gameSessionId}/`, {
+                    headers: {
+                      'Authorization': `Token ${authContext.token}`
+                    }
+                  });
+                  convData = convResponse.ok ? await convResponse.json() : null;
+                }
 
-                if (convResponse.ok) {
-                  const convData = await convResponse.json();
+                if (convData) {
                   const newScore = convData.score || 0;
                   const isCorrect = newScore > previousScore;
                   
@@ -404,7 +408,9 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
                   );
 
                   // Check if word changed (either AI guessed correctly OR ran out of guesses)
-                  const wordChanged = convData.current_word !== currentWord;
+                  const wordChanged = convData.outcome
+                    ? convData.outcome !== 'continue'
+                    : convData.current_word !== currentWord;
 
                   // Update score and word if AI guessed correctly
                   if (isCorrect) {
@@ -413,7 +419,7 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
                     
                     setCurrentScore(newScore);
                     setCurrentWord(convData.current_word);
-                    setWordDescription(convData.word_description || '');
+                    loadWordDescription(convData);
                     
                     // Pass the guessed word to handleRoundEnd
                     handleRoundEnd(true, guessedWord);
@@ -422,7 +428,7 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
                     const oldWord = currentWord;
                     setCurrentWord(convData.current_word);
                     setGuessesRemaining(convData.guesses_remaining);
-                    setWordDescription(convData.word_description || '');
+                    loadWordDescription(convData);
                     handleRoundEnd(false, oldWord);
                   }
                 }
@@ -449,6 +455,30 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
     }
   };
 
+  // Word descriptions are generated in the background; poll until this round's is ready.
+  // Back off to one poll every 5s so a lost description, which the server queues
+  // again after WORD_DESCRIPTION_STALE_SECONDS, still arrives (about a minute in all).
+  const loadWordDescription = async (convData: any) => {
+    if (convData.description_status !== 'pending') {
+      setWordDescription(convData.word_description || '');
+      return;
+    }
+    for (let attempt = 0; attempt < 20; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, Math.min(500 * 1.25 ** attempt, 5000)));
+      const res = await fetch(`http://localhost:8000/api/conversations/${gameSessionId}/description/`, {
+        headers: {
+          'Authorization': `Token ${authContext.token}`
+        }
+      });
+      if (!res.ok) return;
+      const data = await res.json();
+      if (data.status !== 'pending') {
+        setWordDescription(data.word_description || '');
+        return;
+      }
+    }
+  };
+
   const handleRoundEnd = async (aiGuessed: boolean, wordToShow?: string, isTimeout: boolean = false) => {
     // Prevent duplicate calls
     if (isProcessingRoundEnd.current) {
@@ -492,60 +522,25 @@ export function GameScreen({ gameData, setGameData, onEndGame, onBack }: GameScr
         try {
           const topicName = gameData.subcategory.toLowerCase().replace(/ /g, '_');
           
-          // Submit special timeout message to trigger backend word change
-          const response = await fetch(`http://localhost:8000/api/chat-stream/${topicName}/`, {
+          // End the round on the server (no AI call) and get the next word
+          const response = await fetch(`http://localhost:8000/api/conversations/${gameSessionId}/timeout/`, {
             method: 'POST',
             headers: {
               'Content-Type': 'application/json',
               'Authorization': `Token ${authContext.token}`
             },
             body: JSON.stringify({
-              conversation_id: gameSessionId,
-              prompt: '__TIMEOUT__' // Special signal for timeout
+              topic_name: topicName,
+              current_word: displayWord
             }),
           });
 
           if (response.ok) {
-            // Read the stream but don't display bot's response (we already showed our timeout message)
-            const reader = response.body!.getReader();
-            const decoder = new TextDecoder();
-            
-            while (true) {
-              const { value, done } = await reader.read();
-              if (done) break;
-              
-              const chunk = decoder.decode(value, { stream: true });
-              const lines = chunk.split('\n\n');
-              
-              for (const line of lines) {
-                if (line.startsWith('data:')) {
-                  try {
-                    const eventData = JSON.parse(line.substring(5));
-                    // Don't add the bot's response to messages - we already showed timeout message
-                    if (eventData.done) {
-                      // Fetch updated conversation to get new word
-                      const convResponse = await fetch(`http://localhost:8000/api/conversations/${gameSessionId}/`, {
-                        headers: {
-                          'Authorization': `Token ${authContext.token}`
-                        }
-                      });
-                      
-                      if (convResponse.ok) {
-                        const convData = await convResponse.json();
-                        setCurrentWord(convData.current_word);
-                        setGuessesRemaining(convData.guesses_remaining || 3);
-                        setWordDescription(convData.word_description || '');
-                        console.log('New word after timeout:', convData.current_word);
-                        console.log('Word description:', convData.word_description);
-                      }
-                      break;
-                    }
-                  } catch (e) {
-                    console.error('Error parsing timeout response:', e);
-                  }
-                }
-              }
-            }
+            const convData = await response.json();
+            setCurrentWord(convData.current_word);
+            setGuessesRemaining(convData.guesses_remaining || 3);
+            loadWordDescription(convData);
+            console.log('New word after timeout:', convData.current_word);
           }
         } catch (error) {
           console.error('Error handling round end:', error);
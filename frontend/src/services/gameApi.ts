@@ -150,8 +150,10 @@ export const submitClueAndGetGuess = async (
             }
 
             if (data.done) {
-              const updatedConv = await getConversationDetails(conversationId);
-              const isCorrect = updatedConv.score > 0;
+              // Use the state delta from the final event when the server sends one
+              const isCorrect = data.state
+                ? data.state.outcome === 'won'
+                : (await getConversationDetails(conversationId)).score > 0;
               onComplete(fullResponse, isCorrect);
               return;
             }
@@ -203,6 +205,22 @@ export const uploadTerms = async (file: File, maxTerms = 50,topicName): Promise<
     throw new Error(`Upload failed: ${response.status} ${response.statusText} - ${text}`);
   }
 
-  const data = await response.json();
-  return (data.terms || []) as string[];
+  // Extraction runs as a background job; poll it until it finishes
+  let job = await response.json();
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, 1500));
+    const poll = await fetch(`${API_BASE_URL}/upload-terms/${job.job_id}/`, {
+      headers: {
+        ...(token && { Authorization: `Token ${token}` }),
+      } as any,
+    });
+    if (!poll.ok) {
+      throw new Error(`Upload failed: ${poll.status} ${poll.statusText}`);
+    }
+    job = await poll.json();
+  }
+  if (job.status === 'failed') {
+    throw new Error(`Upload failed: ${job.error}`);
+  }
+  return (job.terms || []) as string[];
 };